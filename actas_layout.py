@@ -0,0 +1,211 @@
+"""
+Actas por bloques en lugar de un solo frame ancho.
+
+pd.concat de las 6 pestañas ACTA une sus columnas: cada fila tiene NaN en
+todas las preguntas de las otras actas. El snapshot guarda un frame angosto
+con los metadatos compartidos (acta, UGEL, código modular, ...) y, por
+pestaña, un bloque solo con sus propias columnas y sus filas; el frame ancho
+existe solo mientras se carga. row_id = posición de la fila en el frame
+concatenado, así que las posiciones del índice de filtros sirven igual.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# Columna con el row_id de cada fila de bloque en los .arrow del snapshot
+ROW_ID = "__row_id"
+
+
+class ActasLayout:
+    def __init__(self, meta: pd.DataFrame, blocks: list[pd.DataFrame],
+                 block_rows: list[np.ndarray], columns: list[str]):
+        """
+        meta: metadatos de todas las filas; blocks[i]: columnas propias de la
+        pestaña i para sus filas block_rows[i] (row_id ordenados); columns:
+        orden de columnas de la vista ancha.
+        """
+        self.meta = meta
+        self.columns = columns
+        self._blocks = blocks
+        self._block_rows = [np.asarray(rows, dtype=np.int32) for rows in block_rows]
+
+        self._row_block = np.full(len(meta), -1, dtype=np.int32)
+        self._question_block = {}
+        for i, block in enumerate(blocks):
+            self._row_block[self._block_rows[i]] = i
+            for c in block.columns:
+                self._question_block.setdefault(c, []).append(i)
+
+    @classmethod
+    def from_tabs(cls, wide: pd.DataFrame, tabs: list[tuple[int, list[str]]],
+                  meta_columns: list[str] = ()) -> "ActasLayout":
+        """
+        wide = pd.concat de las pestañas (en orden, ya tipado y cruzado con
+        BASE); tabs = (filas, columnas) de cada pestaña. Van a meta las
+        columnas que tienen todas las pestañas, las que se agregaron después
+        y meta_columns (cruce con BASE, código modular, acta) aunque falten
+        en alguna pestaña; el resto al bloque de su pestaña. Las columnas
+        completamente vacías se descartan.
+        """
+        columns = [c for c in wide.columns if wide[c].notna().any()]
+        shared = set.intersection(*(set(cols) for _, cols in tabs)) if tabs else set()
+        shared |= set(meta_columns)
+        own = [set(cols) - shared for _, cols in tabs]
+        in_blocks = set().union(*own)
+
+        # Copia: las columnas seleccionadas no deben retener los bloques del frame ancho
+        meta = wide[[c for c in columns if c not in in_blocks]].copy()
+        blocks, block_rows = [], []
+        start = 0
+        for (n_rows, _), cols in zip(tabs, own):
+            rows = np.arange(start, start + n_rows, dtype=np.int32)
+            blocks.append(wide[[c for c in columns if c in cols]].take(rows).reset_index(drop=True))
+            block_rows.append(rows)
+            start += n_rows
+        return cls(meta, blocks, block_rows, columns)
+
+    def frames(self) -> list[pd.DataFrame]:
+        """
+        [meta, bloque 0, bloque 1, ...] para guardar en disco; cada bloque
+        lleva sus row_id en la columna ROW_ID.
+        """
+        return [self.meta] + [
+            block.assign(**{ROW_ID: rows}) for block, rows in zip(self._blocks, self._block_rows)
+        ]
+
+    @classmethod
+    def from_frames(cls, frames: list[pd.DataFrame], columns: list[str]) -> "ActasLayout":
+        """
+        Inverso de frames().
+        """
+        blocks = [f.drop(columns=ROW_ID) for f in frames[1:]]
+        block_rows = [f[ROW_ID].to_numpy() for f in frames[1:]]
+        return cls(frames[0], blocks, block_rows, columns)
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def parts(self, name: str) -> list[tuple[np.ndarray | None, pd.Series]]:
+        """
+        Dónde está guardada una columna: [(None, serie)] si es un metadato
+        (todas las filas) o [(row_ids, serie del bloque), ...] por cada
+        pestaña que la tiene. En el resto de filas la columna está vacía.
+        """
+        if name in self.meta.columns:
+            return [(None, self.meta[name])]
+        return [(self._block_rows[i], self._blocks[i][name]) for i in self._question_block.get(name, [])]
+
+    def _split(self, positions: np.ndarray, blocks: list[int] | None = None):
+        # (bloque, posiciones en el resultado, posiciones dentro del bloque)
+        row_block = self._row_block[positions]
+        for i in range(len(self._blocks)) if blocks is None else blocks:
+            out_pos = np.flatnonzero(row_block == i)
+            if len(out_pos):
+                yield i, out_pos, np.searchsorted(self._block_rows[i], positions[out_pos])
+
+    def column(self, name: str, positions: np.ndarray | None = None) -> pd.Series:
+        """
+        Una columna (metadato o pregunta) para las filas dadas, con NaN
+        donde la pregunta no aplica.
+        """
+        pos = np.arange(len(self)) if positions is None else np.asarray(positions)
+        if name in self.meta.columns:
+            return self.meta[name].take(pos)
+
+        parts = [
+            self._blocks[i][name].take(local).set_axis(out_pos)
+            for i, out_pos, local in self._split(pos, self._question_block.get(name, []))
+        ]
+        if not parts:
+            # Ninguna fila de un acta con esa pregunta: todo vacío, mismo dtype
+            blocks = self._question_block.get(name)
+            if not blocks:
+                return pd.Series(np.nan, index=pos, name=name)
+            parts = [self._blocks[blocks[0]][name].iloc[:0]]
+        if len(parts) == 1 and len(parts[0]) == len(pos):
+            return parts[0].set_axis(pos)
+        return pd.concat(parts).reindex(range(len(pos))).set_axis(pos)
+
+    def frame(self, positions: np.ndarray | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        """
+        Vista ancha (como df_actas.take(positions)) solo de las filas pedidas
+        y de las preguntas de sus actas. Para mostrar, no para agregar.
+        """
+        pos = np.arange(len(self)) if positions is None else np.asarray(positions)
+        cols = self.columns if columns is None else [c for c in columns if c in self.columns]
+
+        out = {c: self.meta[c].take(pos).reset_index(drop=True) for c in cols if c in self.meta.columns}
+        wanted = [c for c in cols if c in self._question_block]
+        parts = {c: [] for c in wanted}
+        for i, out_pos, local in self._split(pos):
+            block = self._blocks[i]
+            for c in wanted:
+                if c in block.columns:
+                    parts[c].append(block[c].take(local).set_axis(out_pos))
+        for c in wanted:
+            if parts[c]:
+                out[c] = pd.concat(parts[c]).reindex(range(len(pos)))
+
+        return pd.DataFrame(out, columns=[c for c in cols if c in out]).set_axis(pos, axis=0)
+
+    def columns_for(self, positions: np.ndarray | None = None) -> list[str]:
+        """
+        Columnas que tendría frame(positions): metadatos + preguntas de las
+        actas presentes en esas filas (sin armar las filas).
+        """
+        if positions is None:
+            present = range(len(self._blocks))
+        else:
+            present = np.unique(self._row_block[positions])
+        question_cols = set()
+        for i in present:
+            if i >= 0:
+                question_cols.update(self._blocks[i].columns)
+        return [c for c in self.columns if c in self.meta.columns or c in question_cols]
+
+    def nbytes(self) -> int:
+        total = int(self.meta.memory_usage(deep=True).sum())
+        total += sum(int(b.memory_usage(deep=True).sum()) for b in self._blocks)
+        return total + self._row_block.nbytes + sum(r.nbytes for r in self._block_rows)
+
+
+def _ms(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def compare_with_wide(wide: pd.DataFrame, layout: ActasLayout,
+                      positions: np.ndarray, question: str | None) -> dict:
+    """
+    Memoria y tiempos (ms, mejor de 5) del frame ancho vs. bloques por acta:
+    filtrar = tomar las filas filtradas; agregar = conteo de respuestas de
+    una pregunta sobre esas filas. Solo para diagnóstico (DEBUG): el frame
+    ancho se arma aparte (layout.frame()) para comparar.
+    """
+    report = {
+        "bytes_ancho": int(wide.memory_usage(deep=True).sum()),
+        "bytes_bloques": layout.nbytes(),
+        "filtrar_ancho_ms": _ms(lambda: wide.take(positions)),
+        "filtrar_bloques_ms": _ms(lambda: layout.meta.take(positions)),
+    }
+    if question:
+        report["agregar_ancho_ms"] = _ms(lambda: wide[question].take(positions).value_counts())
+        report["agregar_bloques_ms"] = _ms(lambda: layout.column(question, positions).value_counts())
+    return report
+
+
+def format_layout_report(r: dict) -> str:
+    mb = 1024 * 1024
+    txt = (
+        f"Actas por bloques {r['bytes_bloques'] / mb:.1f} MB (ancho {r['bytes_ancho'] / mb:.1f} MB) · "
+        f"filtrar {r['filtrar_bloques_ms']:.1f} ms (ancho {r['filtrar_ancho_ms']:.1f} ms)"
+    )
+    if "agregar_bloques_ms" in r:
+        txt += f" · agregar {r['agregar_bloques_ms']:.1f} ms (ancho {r['agregar_ancho_ms']:.1f} ms)"
+    return txt
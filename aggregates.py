@@ -0,0 +1,536 @@
+"""
+Agregados precalculados por snapshot.
+
+Se construyen una vez (vía Snapshot.derived) y los módulos los consultan con
+las posiciones de fila que devuelve el índice de filtros, en lugar de
+re-pivotear o re-escanear las filas en cada rerun.
+"""
+import numpy as np
+import pandas as pd
+
+from actas_layout import ActasLayout
+from schema import ACTA_LABELS
+
+
+# Variantes aceptadas como SI / NO (el resto, incluidos vacíos, es "otro")
+YES_VALUES = ("SI", "SÍ", "1", "TRUE", "VERDADERO", "YES")
+NO_VALUES = ("NO", "0", "FALSE", "FALSO")
+
+# Campos administrativos / descriptivos de las actas (no son preguntas)
+ADMIN_COLUMNS = {
+    "marca_temporal", "timestamp",
+    "nombre_ie", "nombre_ie_final",
+    "direccion",
+    "titular_ie",
+    "dni_titular_ie",
+    "auditor",
+    "dni_auditor",
+
+    "departamento", "provincia", "distrito",
+    "d_dpto", "d_prov", "d_dist",
+    "cen_edu",
+    "t_alumno", "talumno", "t_alumnos", "cantidad_alumnos",
+    "llave_unica",
+}
+
+# popcount de 0..255
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def in_memory(name: str, key, builder) -> dict[str, np.ndarray]:
+    """
+    `share` por defecto de las estructuras de este módulo: los arreglos se
+    quedan en el proceso. Con Snapshot.shared_arrays se mapean desde disco.
+    """
+    return builder()
+
+
+# -------------------------
+# 🧩 COMPLETITUD DE ACTAS
+# -------------------------
+class Completeness:
+    """
+    Bitmask uint8 de las 6 actas por código modular (bit i = ACTA 0{i+1}).
+
+    Por fila se guarda (código modular codificado, índice de acta); el
+    bitmask de cualquier subconjunto de filas se arma con 6 asignaciones
+    vectorizadas. Sin filtros se usa el bitmask completo ya materializado.
+    Los dos arreglos por fila pasan por `share`.
+    """
+
+    def __init__(self, actas: pd.DataFrame, base: pd.DataFrame,
+                 col_codmod: str, col_acta: str, col_ie: str | None, share=in_memory):
+        codes, uniques = pd.factorize(actas[col_codmod], use_na_sentinel=True)
+        self.codmods = pd.Index(uniques, name=col_codmod)
+
+        def build():
+            # Índice 0..5 del acta por fila (-1 si no es ACTA 01..06)
+            acta_pos = {label: i for i, label in enumerate(ACTA_LABELS)}
+            acta_codes, acta_uniques = pd.factorize(actas[col_acta], use_na_sentinel=True)
+            lookup = np.array([acta_pos.get(str(u), -1) for u in acta_uniques] + [-1], dtype=np.int8)
+            # el sentinel -1 cae en el último elemento
+            return {"row_codmod": codes.astype(np.int32), "row_acta": lookup[acta_codes]}
+
+        rows = share("completeness", (col_codmod, col_acta), build)
+        self.row_codmod = rows["row_codmod"]
+        self.row_acta = rows["row_acta"]
+
+        # Orden ascendente por código modular para las tablas
+        self._order = np.argsort(self.codmods.to_numpy(), kind="stable")
+
+        self.col_codmod = col_codmod
+        self.col_ie = col_ie
+        if col_ie and col_ie in base.columns:
+            ie = base[[col_codmod, col_ie]].dropna(subset=[col_codmod])
+            ie = ie.drop_duplicates(subset=[col_codmod]).set_index(col_codmod)[col_ie]
+            self.ie_names = ie.reindex(self.codmods)
+        else:
+            self.ie_names = None
+
+        self._full = self._reduce(None)
+
+    def _reduce(self, positions: np.ndarray | None):
+        """
+        (presentes, bitmask) por código modular para las filas dadas.
+        """
+        codmod = self.row_codmod
+        acta = self.row_acta
+        if positions is not None:
+            codmod = codmod[positions]
+            acta = acta[positions]
+
+        valid = codmod >= 0
+        present = np.zeros(len(self.codmods), dtype=bool)
+        present[codmod[valid]] = True
+
+        mask = np.zeros(len(self.codmods), dtype=np.uint8)
+        for i in range(len(ACTA_LABELS)):
+            has = np.zeros(len(self.codmods), dtype=bool)
+            has[codmod[valid & (acta == i)]] = True
+            mask |= has.astype(np.uint8) << i
+        return present, mask
+
+    def masks(self, positions: np.ndarray | None = None):
+        if positions is None:
+            return self._full
+        return self._reduce(positions)
+
+    def summary(self, positions: np.ndarray | None = None) -> dict:
+        """
+        Totales de IIEE evaluadas, completas (6/6) e incompletas.
+        """
+        present, mask = self.masks(positions)
+        avance = _POPCOUNT[mask[present]]
+        completos = int((avance == len(ACTA_LABELS)).sum())
+        total = int(present.sum())
+        return {"total": total, "completos": completos, "incompletos": total - completos}
+
+    def table(self, positions: np.ndarray | None = None, only_incomplete: bool = False) -> pd.DataFrame:
+        """
+        Matriz de completitud (IE, ACTA 01..06 en 0/1, avance_actas, estado)
+        indexada por código modular, solo de los códigos presentes.
+        """
+        present, mask = self.masks(positions)
+        avance = _POPCOUNT[mask]
+
+        keep = present & (avance < len(ACTA_LABELS)) if only_incomplete else present
+        sel = self._order[keep[self._order]]
+        m = mask[sel]
+
+        out = pd.DataFrame(
+            {label: ((m >> i) & 1).astype(int) for i, label in enumerate(ACTA_LABELS)},
+            index=self.codmods[sel],
+        )
+        out["avance_actas"] = avance[sel].astype(int)
+        out["estado"] = np.where(out["avance_actas"] == len(ACTA_LABELS), "COMPLETO", "INCOMPLETO")
+
+        if self.ie_names is not None:
+            out.insert(0, self.col_ie, self.ie_names.to_numpy()[sel])
+        return out
+
+
+# -------------------------
+# 📋 CATÁLOGO DE PREGUNTAS
+# -------------------------
+def answer_domain(series: pd.Series) -> str:
+    """
+    "binaria" (solo variantes SI/NO), "numerica", "texto" o "vacia",
+    mirando solo los valores únicos no vacíos.
+    """
+    uniques = pd.Series(series.dropna().unique())
+    txt = uniques.astype(str).str.strip()
+    txt = txt[txt != ""]
+    if txt.empty:
+        return "vacia"
+    if txt.str.upper().isin(YES_VALUES + NO_VALUES).all():
+        return "binaria"
+    if pd.to_numeric(txt, errors="coerce").notna().all():
+        return "numerica"
+    return "texto"
+
+
+class QuestionCatalog:
+    """
+    Columnas de pregunta del snapshot: a qué acta(s) pertenecen (filas de esa
+    acta donde la columna existe), cuántas respuestas no vacías tienen y su
+    dominio. Reemplaza el recorrido de columnas sobre el frame filtrado.
+    Cada columna se lee solo en las filas donde está guardada (ver
+    ActasLayout.parts), sin armar el frame ancho.
+    """
+
+    def __init__(self, actas: ActasLayout, col_acta: str, exclude: set[str]):
+        columns = [c for c in actas.columns if c != col_acta and c not in exclude]
+        acta_all = actas.meta[col_acta]
+
+        rows = []
+        for c in columns:
+            parts = actas.parts(c)
+            s = pd.concat([p for _, p in parts], ignore_index=True)
+            acta = pd.concat(
+                [acta_all if pos is None else acta_all.take(pos) for pos, _ in parts], ignore_index=True
+            )
+            present = s.notna()
+            if not present.any():
+                continue
+            answered = present & s.astype("string").str.strip().ne("")
+            by_acta = pd.DataFrame({"filas": present, "no_vacios": answered}) \
+                .groupby(acta, observed=True).sum()
+            by_acta = by_acta[by_acta["filas"] > 0]
+            domain = answer_domain(s)
+            for a, r in by_acta.iterrows():
+                rows.append({
+                    "pregunta": c,
+                    "acta": a,
+                    "filas": int(r["filas"]),
+                    "no_vacios": int(r["no_vacios"]),
+                    "dominio": domain,
+                })
+
+        self.table = pd.DataFrame(rows, columns=["pregunta", "acta", "filas", "no_vacios", "dominio"])
+        # Orden de columnas del snapshot
+        self._all = list(dict.fromkeys(self.table["pregunta"]))
+        self._by_acta = {
+            a: list(g["pregunta"]) for a, g in self.table.groupby("acta", sort=False)
+        }
+
+    def questions(self, acta: str | None = None) -> list[str]:
+        """
+        Preguntas de un acta (None / "TODAS" = todas).
+        """
+        if acta in (None, "TODAS"):
+            return self._all
+        return self._by_acta.get(acta, [])
+
+    def info(self, question: str, acta: str | None = None) -> dict:
+        """
+        Filas, respuestas no vacías y dominio de una pregunta (sumado sobre
+        las actas si acta es None / "TODAS").
+        """
+        t = self.table[self.table["pregunta"] == question]
+        if acta not in (None, "TODAS"):
+            t = t[t["acta"] == acta]
+        return {
+            "actas": list(t["acta"]),
+            "filas": int(t["filas"].sum()),
+            "no_vacios": int(t["no_vacios"].sum()),
+            "dominio": t["dominio"].iloc[0] if len(t) else None,
+        }
+
+
+# -------------------------
+# ✅ RESPUESTAS SI/NO
+# -------------------------
+def encode_yes_no(series: pd.Series) -> np.ndarray:
+    """
+    SI=1, NO=0, otro/vacío=-1 (int8). El texto se normaliza solo sobre los
+    valores únicos de la columna.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    txt = pd.Index(uniques).astype(str).str.strip().str.upper()
+    labels = np.where(txt.isin(YES_VALUES), 1, np.where(txt.isin(NO_VALUES), 0, -1))
+    # el sentinel -1 de factorize cae en el último elemento (otro)
+    return np.append(labels, -1).astype(np.int8)[codes]
+
+
+class AnswerMatrix:
+    """
+    Respuestas de todas las columnas de pregunta codificadas una vez por
+    snapshot en una matriz int8 (filas × preguntas). Los conteos SI/NO/otros
+    de cualquier subconjunto de filas salen de una sola reducción. La matriz
+    pasa por `share` (mapeada desde disco en el dashboard).
+    """
+
+    def __init__(self, actas: ActasLayout, columns: list[str], share=in_memory):
+        known = set(actas.columns)
+        self.columns = [c for c in columns if c in known]
+        self.col_pos = {c: i for i, c in enumerate(self.columns)}
+
+        def build():
+            # Filas de actas sin la pregunta: vacío (-1)
+            codes = np.full((len(actas), len(self.columns)), -1, dtype=np.int8)
+            for i, c in enumerate(self.columns):
+                for pos, s in actas.parts(c):
+                    codes[slice(None) if pos is None else pos, i] = encode_yes_no(s)
+            return {"codes": codes}
+
+        self.codes = share("answer_matrix", self.columns, build)["codes"]
+
+    def counts(self, positions: np.ndarray | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        """
+        DataFrame indexado por pregunta con columnas si / no / otros.
+        """
+        cols = self.columns if columns is None else [c for c in columns if c in self.col_pos]
+        m = self.codes if positions is None else self.codes[positions]
+        if columns is not None:
+            m = m[:, [self.col_pos[c] for c in cols]]
+
+        yes = np.count_nonzero(m == 1, axis=0)
+        no = np.count_nonzero(m == 0, axis=0)
+        return pd.DataFrame(
+            {"si": yes, "no": no, "otros": len(m) - yes - no},
+            index=pd.Index(cols, name="pregunta"),
+        )
+
+    def count(self, column: str, positions: np.ndarray | None = None) -> tuple[int, int, int]:
+        """
+        (si, no, otros) de una sola pregunta, como count_yes_no.
+        """
+        col = self.codes[:, self.col_pos[column]]
+        if positions is not None:
+            col = col[positions]
+        yes = int(np.count_nonzero(col == 1))
+        no = int(np.count_nonzero(col == 0))
+        return yes, no, len(col) - yes - no
+
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+
+# -------------------------
+# 🧊 CUBO ACTA × UGEL × DEPARTAMENTO × PREGUNTA
+# -------------------------
+class AnswerCube:
+    """
+    Conteos SI/NO/otros por celda (acta, ugel, dep) y pregunta, más registros
+    e IIEE distintas por celda. Cualquier combinación de esos tres filtros se
+    responde sumando celdas; los filtros por IE o código modular no están en
+    el cubo (covers() = False) y se resuelven con las filas (AnswerMatrix).
+    Los arreglos del cubo pasan por `share`.
+    """
+
+    DIMENSIONS = ("acta", "ugel", "dep")
+
+    def __init__(self, df: pd.DataFrame, answers: AnswerMatrix,
+                 columns: dict[str, str | None], col_codmod: str, share=in_memory):
+        self.questions = answers.columns
+        self.col_pos = answers.col_pos
+
+        # Código por fila de cada dimensión presente (-1 = vacío)
+        self.dims = []
+        self._values = {}
+        row_keys = []
+        for dim in self.DIMENSIONS:
+            col = columns.get(dim)
+            if not col or col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+            self.dims.append(dim)
+            self._values[dim] = {v: i for i, v in enumerate(uniques)}
+            row_keys.append(codes.astype(np.int32))
+
+        key = ([columns[d] for d in self.dims], self.questions, col_codmod)
+        cube = share("answer_cube", key, lambda: self._build(df, answers, self.dims, row_keys, col_codmod))
+        self.cells = cube["cells"]
+        self.records = cube["records"]
+        self.yes = cube["yes"]
+        self.no = cube["no"]
+        self._row_cell = cube["row_cell"]
+        self._row_codmod = cube["row_codmod"]
+        self.iiee = cube["iiee"]
+        self.places = cube["places"]
+        self._cell_place = cube["cell_place"]
+        self.iiee_place = cube["iiee_place"]
+        self.additive = bool(cube["additive"])
+
+    @classmethod
+    def _build(cls, df: pd.DataFrame, answers: AnswerMatrix, dims: list[str],
+               row_keys: list[np.ndarray], col_codmod: str) -> dict[str, np.ndarray]:
+        n = len(df)
+        keys = np.stack(row_keys, axis=1) if row_keys else np.zeros((n, 0), dtype=np.int32)
+        cells, row_cell = np.unique(keys, axis=0, return_inverse=True)
+        row_cell = row_cell.ravel()
+        n_cells = len(cells)
+
+        # Conteos por celda: filas ordenadas por celda + reduceat
+        order = np.argsort(row_cell, kind="stable")
+        bounds = np.searchsorted(row_cell[order], np.arange(n_cells + 1))
+        if n:
+            sorted_codes = answers.codes[order]
+            yes = np.add.reduceat((sorted_codes == 1).astype(np.int32), bounds[:-1], axis=0)
+            no = np.add.reduceat((sorted_codes == 0).astype(np.int32), bounds[:-1], axis=0)
+        else:
+            yes = no = np.zeros((0, len(answers.columns)), dtype=np.int32)
+
+        # IIEE distintas por celda y por "lugar" (ugel, dep) en todas las actas
+        codmod, _ = pd.factorize(df[col_codmod], use_na_sentinel=True)
+        valid = codmod >= 0
+
+        place_dims = [i for i, d in enumerate(dims) if d != "acta"]
+        places, cell_place = np.unique(cells[:, place_dims], axis=0, return_inverse=True)
+        cell_place = cell_place.ravel()
+        row_place = cell_place[row_cell]
+
+        # Si cada IIEE cae en un solo lugar, las IIEE distintas se pueden sumar
+        # entre lugares; si no, se cuentan sobre las filas de las celdas
+        n_places = np.bincount(np.unique(codmod[valid] * len(places) + row_place[valid])
+                               // len(places)) if valid.any() else np.zeros(0)
+        return {
+            "cells": cells,
+            "records": np.diff(bounds),
+            "yes": yes,
+            "no": no,
+            "row_cell": row_cell,
+            "row_codmod": codmod,
+            "iiee": cls._distinct(row_cell[valid], codmod[valid], n_cells),
+            "places": places,
+            "cell_place": cell_place,
+            "iiee_place": cls._distinct(row_place[valid], codmod[valid], len(places)),
+            "additive": np.array((n_places <= 1).all()),
+        }
+
+    @staticmethod
+    def _distinct(group: np.ndarray, codmod: np.ndarray, n_groups: int) -> np.ndarray:
+        if not len(group):
+            return np.zeros(n_groups, dtype=np.int64)
+        width = int(codmod.max()) + 1
+        pairs = np.unique(group.astype(np.int64) * width + codmod)
+        return np.bincount(pairs // width, minlength=n_groups)
+
+    def covers(self, selections: dict) -> bool:
+        return all(k in self.dims for k in selections)
+
+    def values(self, dim: str) -> list:
+        """
+        Valores (no vacíos) de una dimensión del cubo, ordenados.
+        """
+        return sorted(self._values.get(dim, {}), key=str)
+
+    def _cell_mask(self, selections: dict) -> np.ndarray:
+        mask = np.ones(len(self.cells), dtype=bool)
+        for key, value in selections.items():
+            i = self.dims.index(key)
+            mask &= self.cells[:, i] == self._values[key].get(value, -2)
+        return mask
+
+    def counts(self, selections: dict, columns: list[str] | None = None) -> pd.DataFrame:
+        """
+        Igual que AnswerMatrix.counts, sumando celdas del cubo.
+        """
+        cols = self.questions if columns is None else [c for c in columns if c in self.col_pos]
+        idx = [self.col_pos[c] for c in cols]
+        mask = self._cell_mask(selections)
+
+        yes = self.yes[mask][:, idx].sum(axis=0)
+        no = self.no[mask][:, idx].sum(axis=0)
+        total = int(self.records[mask].sum())
+        return pd.DataFrame(
+            {"si": yes, "no": no, "otros": total - yes - no},
+            index=pd.Index(cols, name="pregunta"),
+        )
+
+    def count(self, column: str, selections: dict) -> tuple[int, int, int]:
+        mask = self._cell_mask(selections)
+        i = self.col_pos[column]
+        yes = int(self.yes[mask, i].sum())
+        no = int(self.no[mask, i].sum())
+        return yes, no, int(self.records[mask].sum()) - yes - no
+
+    def totals(self, selections: dict) -> dict:
+        """
+        Registros, IIEE distintas y UGEL distintas bajo los filtros.
+        """
+        mask = self._cell_mask(selections)
+
+        if not self.additive:
+            rows = mask[self._row_cell] & (self._row_codmod >= 0)
+            iiee = len(np.unique(self._row_codmod[rows]))
+        elif "acta" in selections or "acta" not in self.dims:
+            iiee = int(self.iiee[mask].sum())
+        else:
+            # Todas las actas: se suman lugares (una IIEE aparece en varias actas)
+            iiee = int(self.iiee_place[np.unique(self._cell_place[mask])].sum())
+
+        if "ugel" in self.dims:
+            ugel = self.cells[mask, self.dims.index("ugel")]
+            n_ugel = len(np.unique(ugel[ugel >= 0]))
+        else:
+            n_ugel = 0
+
+        return {"registros": int(self.records[mask].sum()), "iiee": iiee, "ugel": n_ugel}
+
+
+# -------------------------
+# ⚠️ SITUACIONES ADVERSAS
+# -------------------------
+class SituacionesMatrix:
+    """
+    Hoja SITUACIONES como matriz numérica (filas × tipo de situación), con
+    región y UGEL categóricas, y la tabla región × tipo ya sumada. El
+    ranking de cualquier filtro (región, tipo) se lee de esa tabla, sin
+    volver a convertir ni recorrer las filas.
+    """
+
+    def __init__(self, df: pd.DataFrame, col_region: str, col_ugel: str | None = None):
+        self.col_region = col_region if col_region in df.columns else None
+        self.col_ugel = col_ugel if col_ugel in df.columns else None
+        self.types = [c for c in df.columns if c not in (self.col_region, self.col_ugel)]
+
+        # Conteos: no numérico o vacío = 0; enteros si todo es entero
+        values = np.zeros((len(df), len(self.types)), dtype=np.float64)
+        for j, c in enumerate(self.types):
+            values[:, j] = pd.to_numeric(df[c], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        if np.array_equal(values, np.round(values)):
+            values = values.astype(np.int64)
+        self.values = values
+
+        if self.col_region is None:
+            self.region = None
+            self.ugel = None
+            self.regions = []
+            self.totals = pd.DataFrame(columns=self.types, dtype=values.dtype)
+        else:
+            self.region = df[self.col_region].astype("category").cat.remove_unused_categories()
+            self.ugel = df[self.col_ugel].astype("category") if self.col_ugel else None
+            categories = self.region.cat.categories
+            self.regions = list(categories)
+
+            # Región × tipo (las filas sin región no cuentan, como en un groupby)
+            codes = self.region.cat.codes.to_numpy()
+            valid = codes >= 0
+            totals = np.zeros((len(categories), len(self.types)), dtype=values.dtype)
+            np.add.at(totals, codes[valid], values[valid])
+            self.totals = pd.DataFrame(totals, index=pd.Index(categories, name=self.col_region),
+                                       columns=self.types)
+
+        self.total_by_region = self.totals.sum(axis=1)
+
+    def ranking(self, region: str = "TODAS", situacion: str = "TODAS") -> pd.DataFrame:
+        """
+        Columnas región / total_situaciones, de mayor a menor: todas las
+        situaciones (TODAS) o un tipo, en todas las regiones o en una.
+        """
+        s = self.total_by_region if situacion == "TODAS" else self.totals[situacion]
+        if region != "TODAS":
+            s = s[s.index == region]
+        out = pd.DataFrame({
+            "región": pd.Categorical(s.index, categories=self.regions),
+            "total_situaciones": s.to_numpy(),
+        })
+        return out.sort_values("total_situaciones", ascending=False, kind="stable")
+
+    def nbytes(self) -> int:
+        total = self.values.nbytes + int(self.totals.memory_usage(deep=True).sum())
+        for s in (self.region, self.ugel):
+            if s is not None:
+                total += int(s.memory_usage(deep=True))
+        return total
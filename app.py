@@ -1,24 +1,41 @@
-import io
-import re
+import os
+import time
 from datetime import datetime
+from functools import partial
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import gspread
 from google.oauth2.service_account import Credentials
 
-# ====== PDF (MVP) ======
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
-from reportlab.lib.units import cm
+from schema import CODMOD_CANDIDATES, FECHA_CANDIDATES, acta_categorical, apply_schema, format_memory
+from actas_layout import ActasLayout, compare_with_wide, format_layout_report
+from aggregates import (
+    ADMIN_COLUMNS, AnswerCube, AnswerMatrix, Completeness, QuestionCatalog, SituacionesMatrix,
+)
+from batch_reports import GROUP_DIMENSIONS, format_batch, run_batch
+from charts import PDF_DPI, data_hash, format_chart_report, payload_bytes, render_situaciones_png, situaciones_spec
+from fact_table import BASE_META_CANDIDATES, join_base
+from filter_index import FilterIndex
+from grid import FrameSource, LayoutSource, paginated_grid
+from memo import ResultMemo, format_memo
+from reports import ReportJobs, build_informe_completo, build_informe_mvp, build_situaciones_pdf, generar_cuadro_resumen
+from sheets import SheetsError, format_stats
+from sources import DataSource, source_from_spec
+from store import SNAPSHOT_DIR, SnapshotStore
+
+
+
 
 
 
 
 
+# Copy-on-Write (siempre activo desde pandas 3): las vistas del snapshot
+# compartido nunca se modifican in situ
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
 
 
 # -------------------------
@@ -76,91 +93,101 @@ def get_gspread_client():
 
 
 
-@st.cache_data(ttl=300)
-def load_all_sheets(spreadsheet_name: str) -> pd.DataFrame:
-    client = get_gspread_client()
-    spreadsheet = client.open_by_key("1mKljLk6nKMq5o6xSk_pBsFVHHqkX4VDP7dhGrd-nOIU")
-
-    worksheets = spreadsheet.worksheets()
-
-    df_base = None
-    df_actas = []
-    df_situaciones = None
-
-    for ws in worksheets:
-        sheet_name = ws.title.strip().upper()
-
-        # 🔹 LEER DATOS SIN get_all_records()
-        values = ws.get_all_values()
-
-        if not values or len(values) < 2:
-            continue
-
-        headers = values[0]
-
-        # 🔹 HACER HEADERS ÚNICOS
-        seen = {}
-        unique_headers = []
-        for h in headers:
-            h_clean = h.strip().lower()
-            if h_clean in seen:
-                seen[h_clean] += 1
-                h_clean = f"{h_clean}_{seen[h_clean]}"
-            else:
-                seen[h_clean] = 0
-            unique_headers.append(h_clean)
-
-        data = values[1:]
-        temp_df = pd.DataFrame(data, columns=unique_headers)
-
-        if temp_df.empty:
-            continue
-
-        # 🔹 BASE CONSOLIDADA
-        if sheet_name == "BASE_CONSOLIDADA":
-            df_base = temp_df
-
-        # 🔹 SITUACIONES
-        elif sheet_name == "SITUACIONES":
-            df_situaciones = temp_df
-
-        # 🔹 ACTAS
-        elif sheet_name.startswith("ACTA"):
-            temp_df["acta"] = sheet_name
-            df_actas.append(temp_df)
-
-
-
+def load_all_sheets(source: DataSource):
+    """
+    Descarga y arma (base, actas, situaciones, stats) desde la fuente.
+    Corre también en segundo plano, así que los errores se lanzan (ValueError)
+    en vez de pintarse con st.error.
+    """
+    # 🔹 LECTURA (Sheets en modo batch/delta/..., o archivos locales)
+    df_base, df_actas, df_situaciones, ingest_stats = source.load()
 
     if df_base is None:
-        st.error("No se encontró la pestaña BASE_CONSOLIDADA.")
-        return pd.DataFrame()
+        raise ValueError("No se encontró la pestaña BASE_CONSOLIDADA.")
 
     if not df_actas:
-        st.error("No se encontraron pestañas de Actas.")
-        return pd.DataFrame()
+        raise ValueError("No se encontraron pestañas de Actas.")
 
     df_actas_full = pd.concat(df_actas, ignore_index=True)
 
     # 🔗 DETECTAR COLUMNA CLAVE
-    possible_keys = ["codigo_modular", "cod_mod", "cod_modular"]
     key_col = None
 
-    for k in possible_keys:
+    for k in CODMOD_CANDIDATES:
         if k in df_base.columns and k in df_actas_full.columns:
             key_col = k
             break
 
     if key_col is None:
-        st.error("No se encontró columna común de código modular para hacer el merge.")
-        return pd.DataFrame()
+        raise ValueError("No se encontró columna común de código modular para hacer el merge.")
 
 
 
     if df_situaciones is None:
         df_situaciones = pd.DataFrame()
 
-    return df_base, df_actas_full, df_situaciones
+    # 🔹 NORMALIZACIÓN (una vez por refresh, no en cada rerun)
+    df_base = normalize_columns(df_base)
+    df_actas_full = coerce_acta(normalize_columns(df_actas_full), "acta")
+    # (filas, columnas) de cada pestaña: qué columnas son propias de cada acta
+    tabs = [(len(t), list(normalize_columns(t).columns)) for t in df_actas]
+    df_situaciones = normalize_columns(df_situaciones)
+
+    # 🔹 TIPADO COMPACTO (categóricas, código modular Int64, fechas)
+    df_base, mem_base = apply_schema(df_base)
+    df_actas_full, mem_actas = apply_schema(df_actas_full)
+    # Situaciones: solo región/UGEL (las columnas de conteo se tratan aparte)
+    df_situaciones, mem_sit = apply_schema(df_situaciones, use_heuristic=False)
+
+    # 🔗 CRUCE CON BASE (una vez): UGEL / dep / prov / dist / IE en cada fila de acta
+    df_actas_full, ingest_stats["cruce_base"], joined_cols = join_base(df_actas_full, df_base, key_col)
+
+    # 🧩 ACTAS POR BLOQUES: el snapshot guarda metadatos + preguntas por
+    # pestaña; el frame ancho se descarta al terminar la carga
+    actas_layout = ActasLayout.from_tabs(df_actas_full, tabs, [*joined_cols, key_col, "acta"])
+    mem_actas = {**mem_actas, "bytes_despues": actas_layout.nbytes()}
+    ingest_stats["memoria"] = {"base": mem_base, "actas": mem_actas, "situaciones": mem_sit}
+
+    return df_base, actas_layout, df_situaciones, ingest_stats
+
+
+@st.cache_resource
+def get_snapshot_store(source_spec: str, ingestion_mode: str, interval: int, jitter: int):
+    """
+    Un store por proceso: sirve el snapshot en disco al arrancar y un único
+    hilo lo refresca desde la fuente cada `interval` s (± `jitter`).
+    """
+    # La fuente (cliente, DeltaSync) se arma aquí: el hilo de fondo no tiene contexto de Streamlit
+    source = source_from_spec(
+        source_spec, get_gspread_client, mode=ingestion_mode,
+        fake_options={
+            "latency": float(os.environ.get("OPERATIVO_FAKE_LATENCY", "0")),
+            "error_rate": float(os.environ.get("OPERATIVO_FAKE_ERROR_RATE", "0")),
+        },
+    )
+    return SnapshotStore(
+        partial(load_all_sheets, source),
+        cache_dir=os.path.join(SNAPSHOT_DIR, source.cache_key),
+        interval=interval,
+        jitter=jitter,
+    )
+
+
+@st.cache_resource
+def get_report_jobs():
+    """
+    Pool de informes PDF del proceso, compartido por todas las sesiones.
+    """
+    return ReportJobs()
+
+
+@st.cache_resource
+def get_chart_cache():
+    """
+    Gráficos renderizados (PNG para PDF) por hash de datos; sobrevive a los
+    cambios de versión del snapshot.
+    """
+    return ResultMemo(CHART_CACHE_BYTES)
 
 
 
@@ -171,9 +198,8 @@ def load_all_sheets(spreadsheet_name: str) -> pd.DataFrame:
 # 🧼 UTILIDADES (NORMALIZACIÓN)
 # -------------------------
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df.columns = [str(c).strip().lower() for c in df.columns]
-    return df
+    # set_axis no duplica los datos (copy-on-write)
+    return df.set_axis([str(c).strip().lower() for c in df.columns], axis=1)
 
 
 def best_col(df: pd.DataFrame, candidates: list[str]) -> str | None:
@@ -186,230 +212,61 @@ def best_col(df: pd.DataFrame, candidates: list[str]) -> str | None:
 
 def coerce_acta(df: pd.DataFrame, col_acta: str) -> pd.DataFrame:
     """
-    Asegura formato 'ACTA 01'...'ACTA 06' si viene raro.
-    """
-    df = df.copy()
-    def fmt(x):
-        s = str(x).strip().upper()
-        m = re.search(r'(\d+)', s)
-        if m:
-            n = int(m.group(1))
-            if 1 <= n <= 6:
-                return f"ACTA {n:02d}"
-        return s
-    df[col_acta] = df[col_acta].apply(fmt)
-    return df
-
-
-def detect_question_columns(df: pd.DataFrame, known_meta: set[str]) -> list[str]:
-    qcols = []
-    for c in df.columns:
-        if c in known_meta:
-            continue
-        if c in {"llave_unica", "id", "timestamp"}:
-            continue
-        # 🔥 CLAVE: eliminar columnas completamente vacías
-        if df[c].dropna().empty:
-            continue
-        qcols.append(c)
-    return qcols
-
-
-def count_yes_no(series: pd.Series):
+    Asegura formato 'ACTA 01'...'ACTA 06' (categórica ordenada) si viene raro.
+    La etiqueta ya se canoniza por pestaña al leer; esto solo cubre el resto
+    de fuentes y se hace sobre los valores únicos, no fila por fila.
     """
-    Cuenta SI/NO de manera robusta (acepta variantes).
-    """
-    s = series.astype(str).str.strip().str.upper()
-
-    yes = s.isin(["SI", "SÍ", "1", "TRUE", "VERDADERO", "YES"]).sum()
-    no = s.isin(["NO", "0", "FALSE", "FALSO"]).sum()
-
-    # Otros (incluye vacíos)
-    other = len(s) - yes - no
-    return int(yes), int(no), int(other)
+    return df.assign(**{col_acta: acta_categorical(df[col_acta])})
 
 
 
 
 
 # -------------------------
-# 📊 GENERADOR DE CUADROS RESUMEN (Tipo Informe Ayacucho)
+# 📥 CARGA DE DATA BASE
 # -------------------------
-def generar_cuadro_resumen(df_filtrado, question_cols):
-    total_iiee = df_filtrado[COL_CODMOD].nunique()
-    resultados = []
-
-    for col in question_cols:
-        if col not in df_filtrado.columns:
-            continue
-
-        yes, no, other = count_yes_no(df_filtrado[col])
-        total = yes + no + other
-
-        if total == 0:
-            continue
-
-        resultados.append({
-            "Pregunta": col,
-            "IEE SI": yes,
-            "% SI": round((yes/total)*100,1),
-            "IEE NO": no,
-            "% NO": round((no/total)*100,1),
-        })
-
-    return pd.DataFrame(resultados)
-
-
-
-
-    # =========================================================
-# ⚠️ FUNCIONES SITUACIONES ADVERSAS
-# =========================================================
-
-def construir_resumen_situaciones(df_situaciones: pd.DataFrame):
-
-    df = df_situaciones.copy()
-    df.columns = df.columns.str.strip().str.lower()
-
-    if "región" not in df.columns:
-        st.error("No se encontró la columna REGIÓN.")
-        return pd.DataFrame()
-
-    columnas_excluir = ["región", "ugel"]
-
-    columnas_situaciones = [
-        col for col in df.columns
-        if col not in columnas_excluir
-    ]
-
-    if not columnas_situaciones:
-        st.warning("No se detectaron columnas de situaciones.")
-        return pd.DataFrame()
-
-    # 🔥 CONVERTIR A NUMÉRICO CORRECTAMENTE
-    for col in columnas_situaciones:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-
-    # 🔥 SUMA REAL (ya no concatenación)
-    df["total_situaciones"] = df[columnas_situaciones].sum(axis=1)
-
-    resumen = (
-        df.groupby("región", as_index=False)["total_situaciones"]
-        .sum()
-        .sort_values("total_situaciones", ascending=False)
-    )
-
-    return resumen
-
-
-def fig_situaciones_top(df_plot: pd.DataFrame, titulo: str):
-
-    total_general = int(df_plot["total_situaciones"].sum())
-
-    fig, ax = plt.subplots(figsize=(14, 7))
-
-    df_plot = df_plot.sort_values("total_situaciones", ascending=False)
-
-    bars = ax.bar(
-        df_plot["región"],
-        df_plot["total_situaciones"]
-    )
-
-    ax.set_title(titulo, fontsize=16, fontweight="bold")
-    ax.set_ylabel("Total de Situaciones")
-    ax.set_xlabel("Región")
-
-    ax.tick_params(axis="x", rotation=45)
-
-    # 🔥 Valores encima de cada barra
-    for bar, value in zip(bars, df_plot["total_situaciones"]):
-        ax.text(
-            bar.get_x() + bar.get_width() / 2,
-            bar.get_height(),
-            str(int(value)),
-            ha="center",
-            va="bottom",
-            fontsize=10,
-            fontweight="bold"
-        )
-
-    # 🔥 TOTAL DINÁMICO DENTRO DEL GRÁFICO
-    ax.text(
-        0.99,
-        0.95,
-        f"TOTAL: {total_general}",
-        transform=ax.transAxes,
-        ha="right",
-        va="top",
-        fontsize=13,
-        fontweight="bold",
-        bbox=dict(boxstyle="round,pad=0.4", facecolor="white", edgecolor="black")
-    )
-
-    plt.tight_layout()
-    return fig
-
-def fig_to_png_bytes(fig):
-    buffer = io.BytesIO()
-    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
-    buffer.seek(0)
-    plt.close(fig)
-    return buffer
-
-
-def build_situaciones_pdf(df_resumen: pd.DataFrame, titulo: str):
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-
-    story.append(Paragraph("REPORTE DE SITUACIONES ADVERSAS", styles["Title"]))
-    story.append(Spacer(1, 12))
-
-    # 🔥 Título dinámico dentro del PDF
-    story.append(Paragraph(titulo, styles["Heading2"]))
-    story.append(Spacer(1, 12))
-
-    # 🔥 Eliminar ceros también en PDF
-    df_resumen = df_resumen[df_resumen["total_situaciones"] > 0]
-
-    fig = fig_situaciones_top(
-        df_resumen,
-        titulo
-    )
-
-    img_buffer = fig_to_png_bytes(fig)
-    story.append(Image(img_buffer, width=16*cm, height=9*cm))
-
-    doc.build(story)
-    buffer.seek(0)
-    return buffer.getvalue()
-
-
-
-
 
+SPREADSHEET_NAME = "BASE_CONSOLIDADA_OPERATIVO_2026"
 
+# "sheets" (producción), "sheets:<key>", "local:<dir>" o "fake:<dir>" (ver sources.py)
+DATA_SOURCE = os.environ.get("OPERATIVO_DATA_SOURCE", "sheets")
 
+# "delta" (solo filas nuevas; ediciones en medio de la hoja con retraso
+# acotado, ver sheets.DeltaSync), "batch" (1 llamada para todas las pestañas),
+# "concurrent" (páginas en paralelo, para pestañas muy grandes)
+# o "per_sheet" (1 llamada por pestaña)
+INGESTION_MODE = "delta"
 
-# -------------------------
-# 📥 CARGA DE DATA BASE
-# -------------------------
+# Refresco en segundo plano (segundos)
+REFRESH_INTERVAL = 300
+REFRESH_JITTER = 30
 
-SPREADSHEET_NAME = "BASE_CONSOLIDADA_OPERATIVO_2026"
+snapshot_store = get_snapshot_store(DATA_SOURCE, INGESTION_MODE, REFRESH_INTERVAL, REFRESH_JITTER)
 
+# Solo espera a Sheets si no hay snapshot en memoria ni en disco
 with st.spinner("Cargando todas las actas desde Google Sheets..."):
+    try:
+        # La sesión mantiene un lease sobre la versión que usa; al pasar a una
+        # versión nueva (o cerrarse la sesión) la anterior se puede liberar
+        snapshot_lease = snapshot_store.lease(st.session_state.get("snapshot_lease"))
+    except (ValueError, SheetsError) as e:
+        st.error(str(e))
+        st.stop()
 
-    df_base_raw, df_actas_raw, df_situaciones_raw = load_all_sheets(SPREADSHEET_NAME)
+st.session_state["snapshot_lease"] = snapshot_lease
+snapshot = snapshot_lease.snapshot
 
-df_base = normalize_columns(df_base_raw)
-df_actas = normalize_columns(df_actas_raw)
-df_situaciones = normalize_columns(df_situaciones_raw) if not df_situaciones_raw.empty else pd.DataFrame()
+# El snapshot ya viene normalizado y es compartido entre sesiones: solo lectura,
+# sin copias por rerun (los módulos trabajan con vistas / máscaras). Actas en
+# bloques: metadatos angostos + preguntas por acta (los módulos filtran y
+# agregan sobre los metadatos; el frame ancho solo se arma para las filas
+# que se muestran)
+df_base, actas_layout, df_situaciones = snapshot.base, snapshot.actas, snapshot.situaciones
+ingest_stats = snapshot.stats
 
 # Columnas base
 
-COL_ACTA = best_col(df_actas, ["acta"])
+COL_ACTA = best_col(actas_layout.meta, ["acta"])
 COL_UGEL = best_col(df_base, ["ugel", "ugel_1", ...])
 COL_CODMOD = best_col(df_base, ["codigo_modular", ...])
 
@@ -417,17 +274,18 @@ COL_CODMOD = best_col(df_base, ["codigo_modular", ...])
 
 
 
-# Columnas BASE (metadatos vienen de BASE_CONSOLIDADA)
-COL_UGEL = best_col(df_base, ["ugel", "ugel_1", "dre_ugel", "d_dreugel", "ugel_x", "ugel_y"])
-COL_CODMOD = best_col(df_base, ["codigo_modular", "cod_mod", "cod_modular"])
-COL_FECHA = best_col(df_base, ["fecha_visita", "fecha", "fecha_de_visita"])
-COL_DEP = best_col(df_base, ["departamento_final", "departamento", "dpto", "d_dpto"])
-COL_PROV = best_col(df_base, ["provincia_final"])
-COL_DIST = best_col(df_base, ["distrito_final"])
-COL_IE = best_col(df_base, ["nombre_ie_final"])
+# Columnas BASE (metadatos vienen de BASE_CONSOLIDADA; las actas ya los
+# traen cruzados por código modular, ver fact_table.py)
+COL_UGEL = best_col(df_base, BASE_META_CANDIDATES["ugel"])
+COL_CODMOD = best_col(df_base, CODMOD_CANDIDATES)
+COL_FECHA = best_col(df_base, FECHA_CANDIDATES)
+COL_DEP = best_col(df_base, BASE_META_CANDIDATES["dep"])
+COL_PROV = best_col(df_base, BASE_META_CANDIDATES["prov"])
+COL_DIST = best_col(df_base, BASE_META_CANDIDATES["dist"])
+COL_IE = best_col(df_base, BASE_META_CANDIDATES["ie"])
 
 # Acta viene de las hojas ACTA 01–06
-COL_ACTA = best_col(df_actas, ["acta"])
+COL_ACTA = best_col(actas_layout.meta, ["acta"])
 
 
 # Columnas de la hoja SITUACIONES
@@ -455,10 +313,11 @@ DEBUG = False
 if DEBUG:
     st.write("Columnas detectadas en el dataframe:")
     st.write("BASE:", df_base.columns.tolist())
-    st.write("ACTAS:", df_actas.columns.tolist())
+    st.write("ACTAS:", actas_layout.columns)
     st.write("Columna Acta detectada:", COL_ACTA)
     st.write("Columna UGEL detectada:", COL_UGEL)
     st.write("Columna Código Modular detectada:", COL_CODMOD)
+    st.write("Costo de la última carga:", ingest_stats)
 
 
 
@@ -483,32 +342,33 @@ if missing_required:
     )
     st.stop()
 
-df_actas = coerce_acta(df_actas, COL_ACTA)
-
 # Metadatos conocidos (se excluyen del módulo de “preguntas”)
 
 
 KNOWN_META = {
     COL_ACTA, COL_UGEL, COL_CODMOD, COL_FECHA, COL_DEP, COL_PROV, COL_DIST,
 
-    # Campos administrativos / descriptivos
-    "marca_temporal", "timestamp",
-    "nombre_ie", "nombre_ie_final",
-    "direccion",
-    "titular_ie",
-    "dni_titular_ie",
-    "auditor",
-    "dni_auditor",
-
-    "departamento", "provincia", "distrito",
-    "d_dpto", "d_prov", "d_dist",
-    "cen_edu",
-    "t_alumno", "talumno", "t_alumnos", "cantidad_alumnos",
-    "llave_unica",
+    # Campos administrativos / descriptivos (ver aggregates.ADMIN_COLUMNS)
+    *ADMIN_COLUMNS,
 }
 
 KNOWN_META = {c for c in KNOWN_META if c is not None}
 
+# Catálogo de preguntas (acta, respuestas no vacías, dominio) por snapshot:
+# las columnas completamente vacías quedan fuera
+question_catalog = snapshot.derived(
+    "question_catalog",
+    lambda snap: QuestionCatalog(snap.actas, COL_ACTA, KNOWN_META | {"llave_unica", "id", "timestamp"}),
+)
+
+# Respuestas SI/NO codificadas una vez por snapshot (preguntas del catálogo);
+# la matriz, el cubo y la completitud se mapean desde el snapshot en disco,
+# compartidos entre los procesos del servidor
+answers = snapshot.derived(
+    "answer_matrix",
+    lambda snap: AnswerMatrix(snap.actas, question_catalog.questions(), share=snap.shared_arrays),
+)
+
 
 
 
@@ -518,41 +378,126 @@ KNOWN_META = {c for c in KNOWN_META if c is not None}
 
 
 
-def apply_all_filters(df_in, acta_sel, ugel_sel, dep_sel, prov_sel, dist_sel, codmod_sel, ie_sel):
+def active_filters(acta_sel="TODAS", ugel_sel="TODAS", dep_sel="TODOS", prov_sel="TODOS",
+                   dist_sel="TODOS", codmod_sel="TODOS", ie_sel="TODOS") -> dict:
     """
-    Aplica los filtros de manera dinámica en función de las selecciones hechas.
+    {clave de filtro: valor} solo con lo seleccionado (sin TODAS/TODOS).
     """
-    out = df_in.copy()
+    sel = {
+        "acta": acta_sel, "ugel": ugel_sel, "dep": dep_sel, "prov": prov_sel,
+        "dist": dist_sel, "codmod": codmod_sel, "ie": ie_sel,
+    }
+    return {k: v for k, v in sel.items() if v not in ("TODAS", "TODOS")}
 
-    # Filtrar por Acta
-    if acta_sel != "TODAS":
-        out = out[out[COL_ACTA] == acta_sel]
 
-    # Filtrar por UGEL
-    if ugel_sel != "TODAS":
-        out = out[out[COL_UGEL] == ugel_sel]
+# Índices invertidos: se arman una vez por snapshot y se comparten entre sesiones
+FILTER_COLUMNS = {
+    "acta": COL_ACTA, "ugel": COL_UGEL, "dep": COL_DEP, "prov": COL_PROV,
+    "dist": COL_DIST, "codmod": COL_CODMOD, "ie": COL_IE,
+}
+idx_actas = snapshot.derived("filter_index_actas", lambda snap: FilterIndex(snap.actas.meta, FILTER_COLUMNS))
 
-    # Filtrar por Departamento
-    if dep_sel != "TODOS":
-        out = out[out[COL_DEP] == dep_sel]
+# Cubo acta × UGEL × departamento × pregunta (conteos SI/NO e IIEE por celda)
+answer_cube = snapshot.derived(
+    "answer_cube",
+    lambda snap: AnswerCube(snap.actas.meta, answers, FILTER_COLUMNS, COL_CODMOD, share=snap.shared_arrays),
+)
 
-    # Filtrar por Provincia (dependiente del Departamento)
-    if prov_sel != "TODOS" and COL_PROV:
-        out = out[out[COL_PROV] == prov_sel]
 
-    # Filtrar por Distrito (dependiente de la Provincia)
-    if dist_sel != "TODOS" and COL_DIST:
-        out = out[out[COL_DIST] == dist_sel]
+def answer_counts(question_cols, selections: dict, positions=None) -> pd.DataFrame:
+    """
+    SI/NO/otros por pregunta: del cubo si los filtros son solo acta / UGEL /
+    departamento; con IE o código modular, de las filas filtradas.
+    """
+    if answer_cube.covers(selections):
+        return answer_cube.counts(selections, question_cols)
+    return answers.counts(positions, question_cols)
 
-    # Filtrar por Código Modular
-    if codmod_sel != "TODOS":
-        out = out[out[COL_CODMOD] == codmod_sel]
 
-    # Filtrar por Institución Educativa
-    if ie_sel != "TODOS" and COL_IE:
-        out = out[out[COL_IE] == ie_sel]
+def answer_count(question_col, selections: dict, positions=None) -> tuple[int, int, int]:
+    if answer_cube.covers(selections):
+        return answer_cube.count(question_col, selections)
+    return answers.count(question_col, positions)
 
-    return out
+
+def filter_totals(df_f: pd.DataFrame, selections: dict) -> dict:
+    """
+    Registros, IIEE (cód. modular únicos) y UGEL bajo los filtros.
+    """
+    if answer_cube.covers(selections):
+        return answer_cube.totals(selections)
+    return {
+        "registros": len(df_f),
+        "iiee": df_f[COL_CODMOD].nunique(dropna=True),
+        "ugel": df_f[COL_UGEL].nunique(dropna=True),
+    }
+
+
+if DEBUG:
+    # Bloques vs. frame ancho (armado solo para comparar), primera UGEL
+    ugels = idx_actas.options("ugel")
+    pos = idx_actas.positions({"ugel": ugels[0]} if ugels else {})
+    pos = np.arange(len(actas_layout)) if pos is None else pos
+    questions = question_catalog.questions()
+    st.write(format_layout_report(
+        compare_with_wide(actas_layout.frame(), actas_layout, pos, questions[0] if questions else None)
+    ))
+
+
+# Bitmask de las 6 actas por código modular (KPIs y Seguimiento)
+completeness = snapshot.derived(
+    "completeness",
+    lambda snap: Completeness(snap.actas.meta, snap.base, COL_CODMOD, COL_ACTA, COL_IE, share=snap.shared_arrays),
+)
+
+# Memo LRU de resultados por tupla de filtros (+ parámetros del módulo); se
+# descarta junto con el snapshot, así que nunca sirve datos de otra versión
+MEMO_MAX_BYTES = 64 * 1024 * 1024
+result_memo = snapshot.derived("result_memo", lambda snap: ResultMemo(MEMO_MAX_BYTES))
+
+# Informes PDF en segundo plano; la clave lleva la versión del snapshot
+report_jobs = get_report_jobs()
+
+CHART_CACHE_BYTES = 32 * 1024 * 1024
+chart_cache = get_chart_cache()
+
+
+def report_status(key: tuple, file_name: str, mime: str = "application/pdf",
+                  label: str = "⬇️ Descargar Informe PDF"):
+    """
+    Estado de un informe: barra de avance mientras se genera (el fragmento
+    se refresca solo cada segundo), error, o botón de descarga si ya está.
+    """
+    job = report_jobs.get(key)
+    if job is None:
+        return
+    pending = not job.done()
+
+    @st.fragment(run_every=1 if pending else None)
+    def _status():
+        if not job.done():
+            st.progress(job.progress, text=f"Generando {file_name}… {job.progress:.0%}")
+            return
+        if pending:
+            # Terminó mientras se esperaba: rerun completo para dejar de refrescar
+            st.rerun()
+        if job.error() is not None:
+            st.error(f"No se pudo generar el PDF: {job.error()}")
+            return
+        result = job.result()
+        data, detail = result if isinstance(result, tuple) else (result, None)
+        st.success(f"{file_name} generado ({job.seconds:.1f} s).")
+        if detail:
+            st.caption(detail)
+        st.download_button(
+            label=label,
+            data=data,
+            file_name=file_name,
+            mime=mime,
+            key=f"descargar_{file_name}",
+        )
+
+    _status()
 
 
 
@@ -579,6 +524,34 @@ module = st.sidebar.radio(
 
 st.sidebar.markdown("---")
 st.sidebar.success(f"Usuario: {st.session_state.get('user','')}")
+st.sidebar.caption(f"Última carga: {format_stats(ingest_stats)}")
+if "memoria" in ingest_stats:
+    st.sidebar.caption(f"Memoria: {format_memory(ingest_stats['memoria'])}")
+if ingest_stats.get("cruce_base", {}).get("sin_base"):
+    st.sidebar.caption(
+        f"Actas sin código modular en BASE: {ingest_stats['cruce_base']['sin_base']:,}".replace(",", " ")
+    )
+
+# 🕒 Frescura del snapshot
+edad_min = snapshot.age_seconds / 60
+ultimo_ok = (
+    datetime.fromtimestamp(snapshot_store.last_success_at).strftime("%d/%m/%Y %H:%M:%S")
+    if snapshot_store.last_success_at else "pendiente"
+)
+st.sidebar.caption(
+    f"Datos v{snapshot.version} · antigüedad {edad_min:.0f} min · "
+    f"última actualización OK: {ultimo_ok}"
+)
+versiones = snapshot_store.registry.versions()
+st.sidebar.caption(
+    "Versiones en memoria: "
+    + " · ".join(f"v{v} ({n} sesiones)" for v, n in sorted(versiones.items(), reverse=True))
+)
+if snapshot_store.last_error:
+    st.sidebar.warning(
+        f"No se pudo actualizar desde Sheets ({snapshot_store.failures} intentos): "
+        f"{snapshot_store.last_error}"
+    )
 
 
 
@@ -586,9 +559,8 @@ st.sidebar.success(f"Usuario: {st.session_state.get('user','')}")
 
 
 
-# Actas / UGEL para filtros
-acta_list = ["TODAS"] + sorted(df_actas[COL_ACTA].dropna().unique().tolist())
-ugel_list = ["TODAS"] + sorted(df_base[COL_UGEL].dropna().unique().tolist())
+# Actas para filtros (opciones desde el índice, sin unique() por rerun)
+acta_list = ["TODAS"] + idx_actas.options("acta")
 
 st.sidebar.markdown("---")
 
@@ -597,48 +569,45 @@ if module != "Situaciones Adversas":
     st.sidebar.markdown("---")
     st.sidebar.subheader("Filtros Globales")
 
-    # Acta
+    # Cascada: cada lista solo ofrece valores con actas bajo los filtros de arriba
     acta_sel = st.sidebar.selectbox("Acta", acta_list)
 
-    df_actas_filtrado = apply_all_filters(
-        df_actas, acta_sel, "TODAS", "TODOS", "TODOS", "TODOS", "TODOS", "TODOS"
-    )
-
-    ugel_list = ["TODAS"] + sorted(df_actas_filtrado[COL_UGEL].dropna().unique().tolist())
+    ugel_list = ["TODAS"] + idx_actas.options("ugel", active_filters(acta_sel))
     ugel_sel = st.sidebar.selectbox("UGEL", ugel_list)
 
     if COL_DEP:
-        dep_list = ["TODOS"] + sorted(df_base[COL_DEP].dropna().unique())
+        dep_list = ["TODOS"] + idx_actas.options("dep", active_filters(acta_sel, ugel_sel))
         dep_sel = st.sidebar.selectbox("Departamento", dep_list)
     else:
         dep_sel = "TODOS"
 
-    codmod_list = ["TODOS"] + sorted(
-        df_base[df_base[COL_DEP] == dep_sel][COL_CODMOD].dropna().unique()
+    codmod_list = ["TODOS"] + idx_actas.options(
+        "codmod", active_filters(acta_sel, ugel_sel, dep_sel)
     )
     codmod_sel = st.sidebar.selectbox("Código Modular", codmod_list)
 
     if COL_IE:
-        if dep_sel != "TODOS":
-            filtered_df = df_base[df_base[COL_DEP] == dep_sel]
-        else:
-            filtered_df = df_base
-
-        ie_list = ["TODOS"] + sorted(filtered_df[COL_IE].dropna().unique())
+        ie_list = ["TODOS"] + idx_actas.options(
+            "ie", active_filters(acta_sel, ugel_sel, dep_sel, codmod_sel=codmod_sel)
+        )
         ie_sel = st.sidebar.selectbox("Institución Educativa", ie_list)
     else:
         ie_sel = "TODOS"
 
-    df_base_filtrado = apply_all_filters(
-        df_base, acta_sel, ugel_sel, dep_sel,
-        "TODOS", "TODOS", codmod_sel, ie_sel
-    )
+    # Clave del memo: (acta, ugel, dep, prov, dist, codmod, ie)
+    filter_key = (acta_sel, ugel_sel, dep_sel, "TODOS", "TODOS", codmod_sel, ie_sel)
 
-    df_actas_filtrado = apply_all_filters(
-        df_actas, acta_sel, ugel_sel, dep_sel,
-        "TODOS", "TODOS", codmod_sel, ie_sel
+    # Posiciones de las actas filtradas (None = sin filtros); también las usa
+    # el bitmask de completitud
+    sel_actas = active_filters(acta_sel, ugel_sel, dep_sel, codmod_sel=codmod_sel, ie_sel=ie_sel)
+    pos_actas = result_memo.get(("pos_actas",) + filter_key, lambda: idx_actas.positions(sel_actas))
+    # Solo metadatos (frame angosto); las preguntas se leen de actas_layout
+    df_actas_filtrado = actas_layout.meta if pos_actas is None else result_memo.get(
+        ("actas",) + filter_key, lambda: actas_layout.meta.take(pos_actas)
     )
 
+    st.sidebar.caption(format_memo(result_memo.stats()))
+
 
 
 
@@ -668,31 +637,16 @@ if module == "Inicio / KPIs Estratégicos":
 
     df_f = df_actas_filtrado
 
-    # KPIs
-    total_registros = len(df_f)
-
-
-
-    # Limpieza de códigos modulares para evitar duplicados falsos
-    cod = (
-        df_f[COL_CODMOD]
-        .astype(str)
-        .str.strip()
-        .replace({"": pd.NA, "nan": pd.NA, "None": pd.NA})
-    )
-
-    # eliminar casos tipo 1234567.0
-    cod = cod.str.replace(r"\.0$", "", regex=True)
-
-    total_iiee = cod.dropna().nunique()
-
-
-
-
-
-
-
-    total_ugel = df_f[COL_UGEL].nunique(dropna=True)
+    # KPIs (memoizados por filtros: volver al módulo no recalcula)
+    # Código modular ya viene como Int64 (casos tipo 1234567.0 resueltos al cargar)
+    kpis = result_memo.get(("kpis",) + filter_key, lambda: {
+        "registros": len(df_f),
+        "iiee": df_f[COL_CODMOD].nunique(dropna=True),
+        "ugel": df_f[COL_UGEL].nunique(dropna=True),
+    })
+    total_registros = kpis["registros"]
+    total_iiee = kpis["iiee"]
+    total_ugel = kpis["ugel"]
 
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Total Registros", f"{total_registros:,}".replace(",", " "))
@@ -700,48 +654,40 @@ if module == "Inicio / KPIs Estratégicos":
     c3.metric("Total UGEL", f"{total_ugel:,}".replace(",", " "))
 
     # Completitud global (si filtras TODAS)
-    # Mide cuántos cod_mod tienen presencia en las 6 actas
-    pivot = (
-        df_f.groupby([COL_CODMOD, COL_ACTA])
-            .size()
-            .unstack(fill_value=0)
-    )
-    # Asegura columnas actas 01-06
-    for a in [f"ACTA {i:02d}" for i in range(1, 7)]:
-        if a not in pivot.columns:
-            pivot[a] = 0
-    pivot = pivot[[f"ACTA {i:02d}" for i in range(1, 7)]]
-
-    pivot_bin = (pivot > 0).astype(int)
-    pivot_bin["avance_actas"] = pivot_bin.sum(axis=1)
-    completos = (pivot_bin["avance_actas"] == 6).sum()
-    incompletos = (pivot_bin["avance_actas"] < 6).sum()
+    # Mide cuántos cod_mod tienen presencia en las 6 actas (bitmask del snapshot)
+    resumen_completitud = result_memo.get(("completitud",) + filter_key, lambda: completeness.summary(pos_actas))
+    completos = resumen_completitud["completos"]
+    incompletos = resumen_completitud["incompletos"]
 
     pct_completo = (completos / (completos + incompletos) * 100) if (completos + incompletos) else 0
     c4.metric("IIEE con 6/6 Actas", f"{pct_completo:.1f}%")
 
     st.markdown("### 📍 Resumen por UGEL (Top)")
-    resumen_ugel = (
-    df_f.groupby(COL_UGEL)
+    resumen_ugel = result_memo.get(("resumen_ugel",) + filter_key, lambda: (
+    df_f.groupby(COL_UGEL, observed=True)
     .agg(
         iiee_unicas=(COL_IE, "nunique"),
         codigos_modulares=(COL_CODMOD, "nunique")
     )
     .reset_index()
     .sort_values("iiee_unicas", ascending=False)
-    )
+    ))
     st.dataframe(resumen_ugel, use_container_width=True, height=420)
 
     # Eliminar las columnas no deseadas
     columns_to_remove = ["llave_unica", "marca_temporal", "nombre_ie", "provincia", "distrito", "direccion"]
-    df_f_cleaned = df_f.drop(columns=columns_to_remove, errors='ignore')
-    df_f_cleaned = df_f_cleaned[[COL_ACTA] + [col for col in df_f_cleaned.columns if col != COL_ACTA]]
+    vista_cols = [c for c in actas_layout.columns_for(pos_actas) if c not in columns_to_remove]
+    vista_cols = [COL_ACTA] + [col for col in vista_cols if col != COL_ACTA]
 
   
 
     # Vista previa de datos filtrados (sin las columnas no deseadas)
     st.markdown("### 🧾 Vista de datos filtrados")
-    st.dataframe(df_f_cleaned, use_container_width=True, height=520)
+    # Paginada en el servidor: solo la página visible se arma y se envía
+    paginated_grid(
+        LayoutSource(actas_layout, pos_actas, vista_cols),
+        key="vista_actas", height=520, memo=result_memo, memo_key=("vista",) + filter_key,
+    )
 
 
 # =========================================================
@@ -754,27 +700,14 @@ elif module == "Seguimiento y Control de Actas":
 
 
 
-    df_f = df_actas_filtrado
-
-    # Matriz de completitud por cod_mod
-    pivot = (
-        df_f.groupby([COL_CODMOD, COL_ACTA])
-            .size()
-            .unstack(fill_value=0)
-    )
-    for a in [f"ACTA {i:02d}" for i in range(1, 7)]:
-        if a not in pivot.columns:
-            pivot[a] = 0
-    pivot = pivot[[f"ACTA {i:02d}" for i in range(1, 7)]]
-
-    binm = (pivot > 0).astype(int)
-    binm["avance_actas"] = binm.sum(axis=1)
-    binm["estado"] = binm["avance_actas"].apply(lambda x: "COMPLETO" if x == 6 else "INCOMPLETO")
+    # Matriz de completitud por cod_mod (bitmask del snapshot, enmascarado
+    # con las posiciones filtradas)
+    resumen_completitud = result_memo.get(("completitud",) + filter_key, lambda: completeness.summary(pos_actas))
 
     # KPI del módulo
-    total_iiee = len(binm)
-    completos = (binm["estado"] == "COMPLETO").sum()
-    incompletos = (binm["estado"] == "INCOMPLETO").sum()
+    total_iiee = resumen_completitud["total"]
+    completos = resumen_completitud["completos"]
+    incompletos = resumen_completitud["incompletos"]
 
     k1, k2, k3 = st.columns(3)
     k1.metric("Total IIEE evaluadas", f"{total_iiee:,}".replace(",", " "))
@@ -785,28 +718,17 @@ elif module == "Seguimiento y Control de Actas":
     st.sidebar.subheader("Control")
     show_only_incomplete = st.sidebar.checkbox("Mostrar solo INCOMPLETOS", value=True)
 
-    # Aplicar el filtro de incompletos si está activado
-    if show_only_incomplete:
-        # Filtra los registros donde 'avance_actas' es menor a 6 (incompletos)
-        binm_incompletos = binm[binm["avance_actas"] < 6]
-        out = binm_incompletos.copy()
-    else:
-        out = binm.copy()  # Si no, muestra todos los registros
-
-    # 🔗 Agregar nombre_ie_final desde BASE
-    if COL_IE:
-        base_ie = df_base[[COL_CODMOD, COL_IE]].drop_duplicates()
-
-        out = (
-            out.reset_index()
-            .merge(base_ie, on=COL_CODMOD, how="left")
-            .set_index(COL_CODMOD)
-        )
-
-    # Reordenar columnas (nombre_ie_final al inicio)
-    cols = [COL_IE] + [c for c in out.columns if c != COL_IE]
-    out = out[cols]
-    st.dataframe(out.reset_index().rename(columns={COL_CODMOD: "codigo_modular"}), use_container_width=True, height=600)
+    # Solo incompletos (avance < 6) si está activado; el nombre de la IE
+    # (desde BASE) ya viene unido y al inicio
+    out = result_memo.get(
+        ("seguimiento",) + filter_key + (show_only_incomplete,),
+        lambda: completeness.table(pos_actas, only_incomplete=show_only_incomplete),
+    )
+    paginated_grid(
+        FrameSource(out.reset_index().rename(columns={COL_CODMOD: "codigo_modular"})),
+        key="seguimiento", height=600, memo=result_memo,
+        memo_key=("seguimiento",) + filter_key + (show_only_incomplete,),
+    )
 
 
 # =========================================================
@@ -819,7 +741,8 @@ elif module == "Análisis por Pregunta":
 
     df_f = df_actas_filtrado
 
-    question_cols_filtradas = detect_question_columns(df_f, KNOWN_META)
+    # Solo las preguntas del acta elegida
+    question_cols_filtradas = question_catalog.questions(acta_sel)
 
     if not question_cols_filtradas:
         st.warning(
@@ -834,6 +757,13 @@ elif module == "Análisis por Pregunta":
         question_cols_filtradas,
         key="analisis_pregunta_select"
     )
+
+    info_pregunta = question_catalog.info(pregunta_col, acta_sel)
+    no_vacios = f"{info_pregunta['no_vacios']:,}".replace(",", " ")
+    st.caption(
+        f"Acta(s): {', '.join(info_pregunta['actas'])} · "
+        f"respuestas no vacías: {no_vacios} · dominio: {info_pregunta['dominio']}"
+    )
     
 
 
@@ -844,10 +774,14 @@ elif module == "Análisis por Pregunta":
 
 
 
-    yes, no, other = count_yes_no(df_f[pregunta_col])
+    yes, no, other = result_memo.get(
+        ("conteo",) + filter_key + (pregunta_col,),
+        lambda: answer_count(pregunta_col, sel_actas, pos_actas),
+    )
+    totales = result_memo.get(("totales",) + filter_key, lambda: filter_totals(df_f, sel_actas))
 
     a1, a2, a3, a4 = st.columns(4)
-    a1.metric("Total IIEE (únicas)", f"{df_f[COL_CODMOD].nunique(dropna=True):,}".replace(",", " "))
+    a1.metric("Total IIEE (únicas)", f"{totales['iiee']:,}".replace(",", " "))
     a2.metric("SI", yes)
     a3.metric("NO", no)
     a4.metric("Otros / Vacíos", other)
@@ -873,7 +807,8 @@ elif module == "Análisis por Pregunta":
         show_cols.append(COL_FECHA)
     show_cols.append(pregunta_col)
 
-    st.dataframe(df_f[show_cols].head(500), use_container_width=True, height=520)
+    # El índice de df_f es el row_id (posición en el snapshot)
+    st.dataframe(actas_layout.frame(df_f.index[:500], show_cols), use_container_width=True, height=520)
 
 
 # =========================================================
@@ -895,13 +830,20 @@ elif module == "Generador de Informe PDF (Completo)":
     st.markdown("### 📊 Cuadros Resumen por Pregunta")
 
     
-    question_cols_filtradas = detect_question_columns(df_f, KNOWN_META)
+    question_cols_filtradas = question_catalog.questions(acta_sel)
 
     if not question_cols_filtradas:
         st.warning("No hay columnas de preguntas detectadas.")
         st.stop()
 
-    resumen_df = generar_cuadro_resumen(df_f, question_cols_filtradas)
+    resumen_df = result_memo.get(
+        ("cuadro_resumen",) + filter_key,
+        lambda: generar_cuadro_resumen(answer_counts(question_cols_filtradas, sel_actas, pos_actas)),
+    )
+
+    # Totales del cubo (o de las filas con filtros por IE / código modular),
+    # compartidos por los dos PDF
+    totales = result_memo.get(("totales",) + filter_key, lambda: filter_totals(df_f, sel_actas))
 
 
 
@@ -911,80 +853,15 @@ elif module == "Generador de Informe PDF (Completo)":
 
 
     # -------- PDF COMPLETO --------
-    def build_pdf():
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-
-        story.append(Paragraph("INFORME DE VISITA DE CONTROL", styles["Title"]))
-        story.append(Spacer(1,12))
-
-        story.append(Paragraph(
-            f"Acta: {acta_sel} | UGEL: {ugel_sel} | Departamento: {dep_sel}",
-            styles["Normal"]
-        ))
-        story.append(Spacer(1,12))
-
-        # KPIs generales
-        total_registros = len(df_f)
-        total_iiee = df_f[COL_CODMOD].nunique()
-
-        tabla_kpi = Table([
-            ["Indicador","Valor"],
-            ["Total Registros", total_registros],
-            ["Total IIEE", total_iiee]
-        ])
-
-        tabla_kpi.setStyle(TableStyle([
-            ("GRID",(0,0),(-1,-1),0.5,colors.black),
-            ("BACKGROUND",(0,0),(-1,0),colors.lightgrey)
-        ]))
-
-        story.append(tabla_kpi)
-        story.append(Spacer(1,20))
-
-        # CUADROS POR PREGUNTA
-        for _, row in resumen_df.iterrows():
-            story.append(Paragraph(f"Pregunta: {row['Pregunta']}", styles["Heading3"]))
-            story.append(Spacer(1,6))
-
-            tabla = Table([
-                ["Respuesta","Cantidad IEE","%"],
-                ["SI", row["IEE SI"], f"{row['% SI']}%"],
-                ["NO", row["IEE NO"], f"{row['% NO']}%"],
-            ])
-
-            tabla.setStyle(TableStyle([
-                ("GRID",(0,0),(-1,-1),0.5,colors.black),
-                ("BACKGROUND",(0,0),(-1,0),colors.lightgrey)
-            ]))
-
-            story.append(tabla)
-            story.append(Spacer(1,15))
-
-        doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
-
-
-
-
+    filtros_pdf = {"acta": acta_sel, "ugel": ugel_sel, "dep": dep_sel}
+    key_completo = (snapshot.version, filter_key, "completo")
 
     if st.button("📄 Generar Informe Completo"):
-        pdf_bytes = build_pdf()
-        st.download_button(
-            "⬇️ Descargar Informe PDF",
-            pdf_bytes,
-            "informe_visita_control_completo.pdf",
-            "application/pdf"
+        report_jobs.submit(
+            key_completo,
+            partial(build_informe_completo, resumen_df, totales, filtros_pdf),
         )
-
-
-
-
-
-
+    report_status(key_completo, "informe_visita_control_completo.pdf")
 
     st.markdown("### 📌 Seleccione pregunta para incluir en el PDF")
 
@@ -1011,9 +888,9 @@ elif module == "Generador de Informe PDF (Completo)":
     
 
     # KPIs
-    total_registros = len(df_f)
-    total_iiee = df_f[COL_CODMOD].nunique(dropna=True)
-    total_ugel = df_f[COL_UGEL].nunique(dropna=True)
+    total_registros = totales["registros"]
+    total_iiee = totales["iiee"]
+    total_ugel = totales["ugel"]
 
     c1, c2, c3 = st.columns(3)
     c1.metric("Total Registros", f"{total_registros:,}".replace(",", " "))
@@ -1021,84 +898,45 @@ elif module == "Generador de Informe PDF (Completo)":
     c3.metric("Total UGEL", f"{total_ugel:,}".replace(",", " "))
 
     st.markdown("### Vista previa (datos filtrados)")
-    st.dataframe(df_f.head(300), use_container_width=True, height=420)
-
-    def build_pdf_bytes():
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=1.8*cm,
-            leftMargin=1.8*cm,
-            topMargin=1.6*cm,
-            bottomMargin=1.6*cm
-        )
-        styles = getSampleStyleSheet()
-        story = []
-
-        title = "INFORME DE VISITA DE CONTROL"
-        story.append(Paragraph(title, styles["Title"]))
-        story.append(Spacer(1, 12))
-
-        # Encabezado
-        subt = f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')} | Filtro Acta: {acta_sel} | Filtro UGEL: {ugel_sel}"
-        story.append(Paragraph(subt, styles["Normal"]))
-        story.append(Spacer(1, 12))
-
-        # Tabla KPIs
-        kpi_data = [
-            ["Indicador", "Valor"],
-            ["Total Registros", str(total_registros)],
-            ["Total IIEE (cód. modular únicos)", str(total_iiee)],
-            ["Total UGEL", str(total_ugel)],
-        ]
-        t = Table(kpi_data, colWidths=[10*cm, 6*cm])
-        t.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-            ("GRID", (0, 0), (-1, -1), 0.6, colors.black),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("ALIGN", (1, 1), (1, -1), "CENTER"),
-        ]))
-        story.append(t)
-        story.append(Spacer(1, 16))
-
-        # Cuadro SI/NO por pregunta
-        if pregunta_col:
-            yes, no, other = count_yes_no(df_f[pregunta_col])
-            total = yes + no + other
-
-            story.append(Paragraph(f"CUADRO: Resumen de Respuestas – {pregunta_col}", styles["Heading2"]))
-            story.append(Spacer(1, 8))
-
-            cuadro = [
-                ["Respuesta", "Cantidad IIEE", "Porcentaje"],
-                ["SI", str(yes), f"{(yes/total*100):.1f}%" if total else "0.0%"],
-                ["NO", str(no), f"{(no/total*100):.1f}%" if total else "0.0%"],
-                ["OTROS/VACÍO", str(other), f"{(other/total*100):.1f}%" if total else "0.0%"],
-            ]
-            tt = Table(cuadro, colWidths=[6*cm, 5*cm, 5*cm])
-            tt.setStyle(TableStyle([
-                ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-                ("GRID", (0, 0), (-1, -1), 0.6, colors.black),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("ALIGN", (1, 1), (-1, -1), "CENTER"),
-            ]))
-            story.append(tt)
-            story.append(Spacer(1, 10))
-
-        doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
+    st.dataframe(actas_layout.frame(df_f.index[:300]), use_container_width=True, height=420)
+
+    key_mvp = (snapshot.version, filter_key, "mvp", pregunta_col)
 
     if st.button("📄 Generar PDF (MVP)"):
-        pdf_bytes = build_pdf_bytes()
-        st.success("PDF generado.")
-        st.download_button(
-            label="⬇️ Descargar Informe PDF",
-            data=pdf_bytes,
-            file_name="informe_visita_control_mvp.pdf",
-            mime="application/pdf"
+        conteo = None
+        if pregunta_col:
+            conteo = result_memo.get(
+                ("conteo",) + filter_key + (pregunta_col,),
+                lambda: answer_count(pregunta_col, sel_actas, pos_actas),
+            )
+        report_jobs.submit(
+            key_mvp,
+            partial(build_informe_mvp, totales, filtros_pdf, pregunta_col, conteo),
         )
+    report_status(key_mvp, "informe_visita_control_mvp.pdf")
+
+    # -------- LOTE (un informe completo por grupo, ZIP) --------
+    st.markdown("### 📦 Informes en lote")
+    st.caption(
+        "Un Informe Completo por cada UGEL, departamento o acta (sin los filtros "
+        "de la barra lateral), generados en paralelo y descargados en un ZIP."
+    )
+    dim_lote = st.selectbox(
+        "Agrupar por",
+        list(GROUP_DIMENSIONS),
+        format_func=GROUP_DIMENSIONS.get,
+        key="pdf_lote_dim",
+    )
+    key_lote = (snapshot.version, "lote", dim_lote)
+
+    def build_lote(progress, dim=dim_lote):
+        # batch_reports.py en un proceso aparte (su pool de procesos nunca importa app.py)
+        data, report = run_batch(dim, snapshot_store.cache_dir, progress=progress)
+        return data, format_batch(report)
+
+    if st.button("📦 Generar informes en lote"):
+        report_jobs.submit(key_lote, build_lote)
+    report_status(key_lote, f"informes_{dim_lote}.zip", mime="application/zip", label="⬇️ Descargar ZIP")
 
     
         # =========================================================
@@ -1116,13 +954,28 @@ elif module == "Situaciones Adversas":
     # 🎛 FILTROS DEL MÓDULO SITUACIONES
     # =========================================
 
+    if df_situaciones.empty:
+        st.warning("No se encontró información en la hoja SITUACIONES.")
+        st.stop()
+
+    # Matriz numérica + totales región × tipo (una vez por snapshot)
+    situaciones = snapshot.derived(
+        "situaciones_matrix",
+        lambda snap: SituacionesMatrix(snap.situaciones, "región", COL_SIT_UGEL),
+    )
+
+    if situaciones.col_region is None:
+        st.error("No se encontró la columna REGIÓN.")
+        st.write("Columnas encontradas:", df_situaciones.columns.tolist())
+        st.stop()
+
     st.markdown("### 🎛 Filtros")
 
     colf1, colf2 = st.columns(2)
 
     # 🔹 FILTRO POR REGIÓN
     with colf1:
-        regiones = ["TODAS"] + sorted(df_situaciones["región"].dropna().unique())
+        regiones = ["TODAS"] + situaciones.regions
         region_sel_sit = st.selectbox(
             "Filtrar por Región",
             regiones,
@@ -1131,16 +984,9 @@ elif module == "Situaciones Adversas":
 
     # 🔹 FILTRO POR SITUACIÓN (columnas dinámicas)
     with colf2:
-        columnas_excluir = ["región", "ugel"]
-
-        columnas_situaciones = [
-            col for col in df_situaciones.columns
-            if col not in columnas_excluir
-        ]
-
         situacion_sel = st.selectbox(
             "Filtrar por Tipo de Situación",
-            ["TODAS"] + columnas_situaciones,
+            ["TODAS"] + situaciones.types,
             key="filtro_situacion"
         )
 
@@ -1151,53 +997,8 @@ elif module == "Situaciones Adversas":
 
 
 
-    if df_situaciones.empty:
-        st.warning("No se encontró información en la hoja SITUACIONES.")
-        st.stop()
-
-    
-        st.write("Columnas encontradas:", df_situaciones.columns.tolist())
-        st.stop()
-
-    
-
-    df_sit_filtrado = df_situaciones.copy()
-
-    # Aplicar filtro Región
-    if region_sel_sit != "TODAS":
-        df_sit_filtrado = df_sit_filtrado[
-            df_sit_filtrado["región"] == region_sel_sit
-        ]
-
-    # Si selecciona una sola situación
-    if situacion_sel != "TODAS":
-
-        df_temp = df_sit_filtrado.copy()
-
-        # Convertir columna seleccionada a numérico
-        df_temp[situacion_sel] = pd.to_numeric(
-            df_temp[situacion_sel],
-            errors="coerce"
-        ).fillna(0)
-
-        resumen_situaciones = (
-            df_temp.groupby("región", as_index=False)[situacion_sel]
-            .sum()
-            .rename(columns={situacion_sel: "total_situaciones"})
-            .sort_values("total_situaciones", ascending=False)
-        )
-
-    else:
-        resumen_situaciones = construir_resumen_situaciones(df_sit_filtrado)
-
-
-
-
-
-
-
-
-
+    # Ranking leído de la tabla región × tipo (sin recorrer filas)
+    resumen_situaciones = situaciones.ranking(region_sel_sit, situacion_sel)
 
     if resumen_situaciones.empty:
         st.warning("No hay datos válidos.")
@@ -1215,8 +1016,15 @@ elif module == "Situaciones Adversas":
     
 
     st.markdown("### 📊 Ranking")
-    fig = fig_situaciones_top(df_plot, titulo)
-    st.pyplot(fig, use_container_width=True)
+    # Gráfico nativo (solo viajan los datos); el PNG de alta resolución se
+    # renderiza solo para el PDF y se guarda por hash de los datos
+    t0 = time.perf_counter()
+    chart_spec = situaciones_spec(df_plot, titulo)
+    st.vega_lite_chart(df_plot, chart_spec, use_container_width=True)
+    native_ms = (time.perf_counter() - t0) * 1000
+
+    chart_key = ("situaciones_png", data_hash(df_plot, titulo, PDF_DPI))
+    st.caption(format_chart_report(native_ms, payload_bytes(df_plot, chart_spec), chart_cache.peek(chart_key)))
 
     st.markdown("### 🧾 Cuadro Resumen")
     
@@ -1228,11 +1036,12 @@ elif module == "Situaciones Adversas":
 
 
 
-    pdf_bytes = build_situaciones_pdf(df_plot, titulo)
+    # PDF solo a pedido (y una vez por versión / región / situación)
+    key_sit = (snapshot.version, "situaciones", region_sel_sit, situacion_sel)
+    if st.button("📄 Generar Reporte PDF por Región"):
+        def build_sit_pdf(progress, df=df_plot, titulo=titulo, key=chart_key):
+            raster = chart_cache.get(key, lambda: render_situaciones_png(df, titulo))
+            return build_situaciones_pdf(titulo, raster["png"], progress)
 
-    st.download_button(
-        label="⬇️ Descargar Reporte PDF por Región",
-        data=pdf_bytes,
-        file_name="reporte_situaciones_adversas.pdf",
-        mime="application/pdf"
-        )
\ No newline at end of file
+        report_jobs.submit(key_sit, build_sit_pdf)
+    report_status(key_sit, "reporte_situaciones_adversas.pdf", label="⬇️ Descargar Reporte PDF por Región")
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""
+Informes completos en lote: uno por UGEL, departamento o acta, en un ZIP.
+
+Los cuadros de cada grupo salen del cubo de respuestas del snapshot (una
+suma de celdas por grupo, en el proceso que pide el lote); los PDF, que es
+lo caro, se arman en paralelo en un pool de procesos y se escriben en el
+ZIP a medida que terminan. Cada informe es idéntico al que se obtiene en el
+dashboard filtrando ese grupo y pulsando "Generar Informe Completo".
+
+El pool solo se crea desde este script: con spawn cada proceso hijo vuelve
+a importar el __main__ de quien lo crea, y bajo Streamlit ese es app.py (el
+dashboard completo, con su conexión a Sheets y su refresher). Por eso el
+dashboard no arma el lote en su proceso: corre este script aparte sobre el
+snapshot en disco (run_batch) y lee el ZIP resultante.
+
+Uso sin Streamlit (p. ej. cron nocturno), sobre el snapshot en disco:
+
+    python batch_reports.py --por ugel --salida informes_ugel.zip
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from aggregates import ADMIN_COLUMNS, AnswerCube, AnswerMatrix, QuestionCatalog
+from fact_table import base_meta_columns
+from reports import build_informe_completo, generar_cuadro_resumen
+from schema import CODMOD_CANDIDATES, FECHA_CANDIDATES
+from store import SNAPSHOT_DIR, load_snapshot, read_meta
+
+
+# Dimensiones por las que se puede armar un lote (las del cubo)
+GROUP_DIMENSIONS = {"ugel": "UGEL", "dep": "Departamento", "acta": "Acta"}
+
+BATCH_WORKERS = max(1, min(8, os.cpu_count() or 1))
+
+# Filtros "sin selección" de la barra lateral (encabezado del informe)
+_NO_FILTERS = {"acta": "TODAS", "ugel": "TODAS", "dep": "TODOS"}
+
+
+def group_reports(cube: AnswerCube, catalog: QuestionCatalog, dim: str) -> list[tuple[str, pd.DataFrame, dict, dict]]:
+    """
+    (grupo, cuadro resumen, totales, filtros) de cada valor de `dim`.
+    """
+    items = []
+    for value in cube.values(dim):
+        sel = {dim: value}
+        questions = catalog.questions(value if dim == "acta" else None)
+        resumen = generar_cuadro_resumen(cube.counts(sel, questions))
+        items.append((str(value), resumen, cube.totals(sel), {**_NO_FILTERS, dim: str(value)}))
+    return items
+
+
+def _file_name(dim: str, group: str) -> str:
+    slug = re.sub(r"[^\w\-]+", "_", group).strip("_") or "sin_nombre"
+    return f"informe_{dim}_{slug}.pdf"
+
+
+def _build_one(resumen: pd.DataFrame, totales: dict, filtros: dict) -> tuple[bytes, float]:
+    # Corre en el proceso del pool
+    t0 = time.perf_counter()
+    pdf = build_informe_completo(resumen, totales, filtros)
+    return pdf, time.perf_counter() - t0
+
+
+def build_batch(items: list, dim: str, out, workers: int = BATCH_WORKERS, progress=None) -> dict:
+    """
+    Escribe en `out` (archivo binario) un ZIP con un PDF por grupo y un
+    tiempos.csv. Devuelve {informes: [{grupo, archivo, segundos, bytes}],
+    segundos (pared), workers}. Solo desde este script (ver docstring del
+    módulo); el dashboard usa run_batch.
+    """
+    t0 = time.perf_counter()
+    report = {"informes": [], "workers": min(workers, len(items)) or 1}
+
+    # "spawn": no hereda los hilos ni los locks del proceso padre
+    ctx = multiprocessing.get_context("spawn")
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf, \
+            ProcessPoolExecutor(max_workers=report["workers"], mp_context=ctx) as pool:
+        futures = {
+            pool.submit(_build_one, resumen, totales, filtros): group
+            for group, resumen, totales, filtros in items
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            group = futures[future]
+            pdf, seconds = future.result()
+            name = _file_name(dim, group)
+            zf.writestr(name, pdf)
+            report["informes"].append({
+                "grupo": group, "archivo": name, "segundos": round(seconds, 3), "bytes": len(pdf),
+            })
+            if progress is not None:
+                progress(done / len(items))
+
+        report["segundos"] = round(time.perf_counter() - t0, 3)
+        tiempos = pd.DataFrame(report["informes"], columns=["grupo", "archivo", "segundos", "bytes"])
+        zf.writestr("tiempos.csv", tiempos.sort_values("grupo").to_csv(index=False))
+    return report
+
+
+def run_batch(dim: str, snapshot_dir: str, workers: int | None = None, progress=None) -> tuple[bytes, dict]:
+    """
+    Lote para el dashboard: corre este script en un proceso aparte sobre el
+    snapshot de `snapshot_dir` y devuelve (bytes del ZIP, reporte). El avance
+    llega por stdout (una línea JSON por informe terminado).
+    """
+    with tempfile.TemporaryDirectory(prefix="lote_") as tmp:
+        out_path = os.path.join(tmp, f"informes_{dim}.zip")
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--por", dim, "--salida", out_path,
+            "--snapshot-dir", snapshot_dir, "--json",
+        ]
+        if workers:
+            cmd += ["--workers", str(workers)]
+
+        report = None
+        # stderr a un archivo: un pipe sin leer podría bloquear al hijo
+        with open(os.path.join(tmp, "stderr.txt"), "w+", encoding="utf-8") as err:
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, text=True, encoding="utf-8") as proc:
+                for line in proc.stdout:
+                    if not line.startswith("{"):
+                        continue
+                    msg = json.loads(line)
+                    if "progreso" in msg and progress is not None:
+                        progress(msg["progreso"])
+                    report = msg.get("reporte", report)
+            if proc.returncode != 0 or report is None:
+                err.seek(0)
+                lines = err.read().strip().splitlines()
+                raise RuntimeError(lines[-1] if lines else f"batch_reports.py terminó con código {proc.returncode}")
+
+        with open(out_path, "rb") as f:
+            return f.read(), report
+
+
+def format_batch(report: dict) -> str:
+    n = len(report["informes"])
+    serial = sum(r["segundos"] for r in report["informes"])
+    txt = (
+        f"{n} informes en {report['segundos']:.1f} s con {report['workers']} procesos "
+        f"(suma de informes {serial:.1f} s)"
+    )
+    if n:
+        slowest = max(report["informes"], key=lambda r: r["segundos"])
+        txt += f" · más lento: {slowest['grupo']} ({slowest['segundos']:.2f} s)"
+    if "version" in report:
+        txt = f"Datos v{report['version']} · {txt}"
+    return txt
+
+
+# -------------------------
+# 🌙 LÍNEA DE COMANDOS
+# -------------------------
+def snapshot_aggregates(snap) -> tuple[QuestionCatalog, AnswerCube]:
+    """
+    Catálogo de preguntas y cubo de respuestas de un snapshot, con la misma
+    detección de columnas que el dashboard.
+    """
+    base, actas = snap.base, snap.actas
+    meta = base_meta_columns(base)
+    col_codmod = next((c for c in CODMOD_CANDIDATES if c in base.columns), None)
+    col_fecha = next((c for c in FECHA_CANDIDATES if c in base.columns), None)
+    if "acta" not in actas.meta.columns or col_codmod is None or "ugel" not in meta:
+        raise ValueError("El snapshot no tiene las columnas acta / ugel / código modular.")
+
+    known_meta = {"acta", col_codmod, col_fecha, meta["ugel"], meta.get("dep"), meta.get("prov"), meta.get("dist")}
+    exclude = {c for c in known_meta if c is not None} | ADMIN_COLUMNS | {"llave_unica", "id", "timestamp"}
+    catalog = QuestionCatalog(actas, "acta", exclude)
+    answers = AnswerMatrix(actas, catalog.questions(), share=snap.shared_arrays)
+    dims = {"acta": "acta", "ugel": meta["ugel"], "dep": meta.get("dep")}
+    cube = AnswerCube(actas.meta, answers, dims, col_codmod, share=snap.shared_arrays)
+    return catalog, cube
+
+
+def latest_snapshot_dir(root: str = SNAPSHOT_DIR) -> str | None:
+    """
+    Subdirectorio de `root` (uno por fuente) con el snapshot más reciente.
+    """
+    best, best_at = None, -1.0
+    if not os.path.isdir(root):
+        return None
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        meta = read_meta(path) if os.path.isdir(path) else None
+        if meta and meta.get("created_at", 0) > best_at:
+            best, best_at = path, meta["created_at"]
+    return best
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Informes completos en lote (ZIP) desde el snapshot en disco.")
+    parser.add_argument("--por", choices=list(GROUP_DIMENSIONS), default="ugel", help="dimensión de agrupación")
+    parser.add_argument("--salida", default=None, help="ruta del ZIP (por defecto informes_<por>.zip)")
+    parser.add_argument("--snapshot-dir", default=None,
+                        help=f"directorio del snapshot (por defecto el más reciente bajo {SNAPSHOT_DIR})")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="procesos del pool")
+    parser.add_argument("--json", action="store_true",
+                        help="avance y reporte como líneas JSON en stdout (lo usa el dashboard)")
+    args = parser.parse_args(argv)
+
+    cache_dir = args.snapshot_dir or latest_snapshot_dir()
+    snap = load_snapshot(cache_dir) if cache_dir else None
+    if snap is None:
+        print("No hay snapshot en disco: abra el dashboard una vez para generarlo.", file=sys.stderr)
+        return 1
+
+    t0 = time.perf_counter()
+    catalog, cube = snapshot_aggregates(snap)
+    items = group_reports(cube, catalog, args.por)
+    prep = time.perf_counter() - t0
+
+    progress = None
+    if args.json:
+        def progress(fraction):
+            print(json.dumps({"progreso": fraction}), flush=True)
+
+    out_path = args.salida or f"informes_{args.por}.zip"
+    with open(out_path, "wb") as out:
+        report = build_batch(items, args.por, out, workers=args.workers, progress=progress)
+
+    if args.json:
+        print(json.dumps({"reporte": {**report, "version": snap.version}}), flush=True)
+        return 0
+
+    for r in sorted(report["informes"], key=lambda r: r["grupo"]):
+        print(f"{r['segundos']:8.3f} s  {r['bytes']:>9,} B  {r['archivo']}")
+    print(f"Datos v{snap.version} · cuadros {prep:.2f} s · {format_batch(report)} → {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Gráfico de ranking de Situaciones Adversas.
+
+En pantalla va un gráfico nativo de Streamlit (especificación Vega-Lite):
+solo viajan los datos del ranking y el navegador lo dibuja. El PNG de alta
+resolución (matplotlib) se renderiza solo para el PDF y se guarda por hash
+de los datos, así que el mismo ranking no se vuelve a dibujar aunque cambie
+la versión del snapshot.
+"""
+import hashlib
+import io
+import json
+import time
+
+import pandas as pd
+import pyarrow as pa
+from matplotlib.figure import Figure
+
+
+PDF_DPI = 200
+
+
+def data_hash(df: pd.DataFrame, *extra) -> str:
+    """
+    Hash del contenido (valores + nombres de columnas) y de `extra` (título, dpi).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    h.update(repr(list(df.columns)).encode())
+    for value in extra:
+        h.update(repr(value).encode())
+    return h.hexdigest()
+
+
+# -------------------------
+# 🖥️ EN PANTALLA (nativo)
+# -------------------------
+def situaciones_spec(df_plot: pd.DataFrame, titulo: str) -> dict:
+    """
+    Barras por región (de mayor a menor) con el valor encima y el total
+    como subtítulo; para st.vega_lite_chart(df_plot, spec).
+    """
+    total_general = int(df_plot["total_situaciones"].sum())
+    x = {
+        "field": "región", "type": "nominal", "sort": "-y",
+        "title": "Región", "axis": {"labelAngle": -45},
+    }
+    y = {"field": "total_situaciones", "type": "quantitative", "title": "Total de Situaciones"}
+    return {
+        "title": {"text": titulo, "subtitle": f"TOTAL: {total_general}", "fontSize": 16},
+        "height": 420,
+        "encoding": {"x": x, "y": y},
+        "layer": [
+            {"mark": "bar"},
+            {
+                "mark": {"type": "text", "dy": -6, "fontWeight": "bold"},
+                "encoding": {"text": {"field": "total_situaciones", "type": "quantitative"}},
+            },
+        ],
+    }
+
+
+def payload_bytes(df_plot: pd.DataFrame, spec: dict) -> int:
+    """
+    Bytes que van al navegador: los datos en Arrow IPC + la especificación.
+    """
+    sink = io.BytesIO()
+    table = pa.Table.from_pandas(df_plot, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return len(sink.getvalue()) + len(json.dumps(spec))
+
+
+# -------------------------
+# 🖨️ PARA PDF (raster)
+# -------------------------
+def fig_situaciones_top(df_plot: pd.DataFrame, titulo: str) -> Figure:
+    """
+    Figura matplotlib del ranking. Se usa Figure directamente (sin pyplot)
+    porque el PDF se arma en un hilo del pool de informes.
+    """
+    total_general = int(df_plot["total_situaciones"].sum())
+
+    fig = Figure(figsize=(14, 7))
+    ax = fig.subplots()
+
+    df_plot = df_plot.sort_values("total_situaciones", ascending=False)
+
+    bars = ax.bar(
+        df_plot["región"].astype(str),
+        df_plot["total_situaciones"]
+    )
+
+    ax.set_title(titulo, fontsize=16, fontweight="bold")
+    ax.set_ylabel("Total de Situaciones")
+    ax.set_xlabel("Región")
+
+    ax.tick_params(axis="x", rotation=45)
+
+    # 🔥 Valores encima de cada barra
+    for bar, value in zip(bars, df_plot["total_situaciones"]):
+        ax.text(
+            bar.get_x() + bar.get_width() / 2,
+            bar.get_height(),
+            str(int(value)),
+            ha="center",
+            va="bottom",
+            fontsize=10,
+            fontweight="bold"
+        )
+
+    # 🔥 TOTAL DINÁMICO DENTRO DEL GRÁFICO
+    ax.text(
+        0.99,
+        0.95,
+        f"TOTAL: {total_general}",
+        transform=ax.transAxes,
+        ha="right",
+        va="top",
+        fontsize=13,
+        fontweight="bold",
+        bbox=dict(boxstyle="round,pad=0.4", facecolor="white", edgecolor="black")
+    )
+
+    fig.tight_layout()
+    return fig
+
+
+def fig_to_png_bytes(fig: Figure, dpi: int = PDF_DPI) -> bytes:
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=dpi)
+    return buffer.getvalue()
+
+
+def render_situaciones_png(df_plot: pd.DataFrame, titulo: str, dpi: int = PDF_DPI) -> dict:
+    """
+    {png, ms, dpi}: el PNG del ranking y lo que costó renderizarlo.
+    """
+    t0 = time.perf_counter()
+    png = fig_to_png_bytes(fig_situaciones_top(df_plot, titulo), dpi)
+    return {"png": png, "ms": (time.perf_counter() - t0) * 1000, "dpi": dpi}
+
+
+def format_chart_report(native_ms: float, native_bytes: int, raster: dict | None) -> str:
+    txt = f"Gráfico nativo: {native_ms:.1f} ms · {native_bytes / 1024:.1f} KB enviados"
+    if raster is not None:
+        txt += (
+            f" · PNG {raster['dpi']} dpi (solo PDF): {raster['ms']:.0f} ms · "
+            f"{len(raster['png']) / 1024:.1f} KB"
+        )
+    return txt
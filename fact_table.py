@@ -0,0 +1,64 @@
+"""
+Tabla de hechos: filas de actas con los metadatos de BASE_CONSOLIDADA.
+
+Se arma una vez por refresh: cada fila de acta se cruza con BASE por el
+código modular (Int64) usando un índice hash, y se le copian UGEL,
+departamento, provincia, distrito e IE como categóricas. Así todos los
+filtros y módulos trabajan sobre un solo frame, sin merges por rerun.
+"""
+import numpy as np
+import pandas as pd
+
+
+# Columnas de BASE que viajan a cada fila de acta (primer candidato presente)
+BASE_META_CANDIDATES = {
+    "ugel": ["ugel", "ugel_1", "dre_ugel", "d_dreugel", "ugel_x", "ugel_y"],
+    "dep": ["departamento_final", "departamento", "dpto", "d_dpto"],
+    "prov": ["provincia_final"],
+    "dist": ["distrito_final"],
+    "ie": ["nombre_ie_final"],
+}
+
+
+def base_meta_columns(base: pd.DataFrame) -> dict[str, str]:
+    """
+    {dimensión: columna de BASE} solo para las dimensiones presentes.
+    """
+    out = {}
+    for dim, candidates in BASE_META_CANDIDATES.items():
+        for c in candidates:
+            if c in base.columns:
+                out[dim] = c
+                break
+    return out
+
+
+def join_base(actas: pd.DataFrame, base: pd.DataFrame, key: str) -> tuple[pd.DataFrame, dict, list[str]]:
+    """
+    Devuelve (actas con metadatos de BASE, reporte, columnas escritas). Si un código modular
+    aparece varias veces en BASE se usa la primera fila; las filas de acta
+    sin match conservan lo que traía la propia acta (o quedan vacías).
+    """
+    b = base.dropna(subset=[key]).drop_duplicates(subset=[key])
+    index = pd.Index(b[key].to_numpy(dtype="int64"))  # hash index por código modular
+
+    pos = index.get_indexer(actas[key])
+    matched = pos >= 0
+    safe = np.where(matched, pos, 0)
+
+    joined = {}
+    for col in base_meta_columns(base).values():
+        meta = b[col].astype("category")
+        codes = np.where(matched, meta.cat.codes.to_numpy()[safe], -1) if len(b) else np.full(len(actas), -1)
+        s = pd.Series(pd.Categorical.from_codes(codes, meta.cat.categories), index=actas.index)
+        if col in actas.columns:
+            own = actas[col].astype("string")
+            s = s.astype("string").where(matched, own).astype("category")
+        joined[col] = s
+
+    report = {
+        "filas": len(actas),
+        "sin_base": int((~matched).sum()),
+        "codmod_duplicados_base": int(base[key].dropna().duplicated().sum()),
+    }
+    return actas.assign(**joined), report, list(joined)
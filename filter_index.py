@@ -0,0 +1,83 @@
+"""
+Índice invertido de filtros, construido una vez por snapshot.
+
+Para cada filtro (acta, ugel, dep, prov, dist, codmod, ie) guarda, por valor,
+las posiciones de fila ordenadas (int32). Una combinación de filtros se
+resuelve intersectando esas listas, sin recorrer columnas de texto; las
+opciones en cascada de la barra lateral salen de los mismos códigos.
+"""
+import numpy as np
+import pandas as pd
+
+
+FILTER_KEYS = ("acta", "ugel", "dep", "prov", "dist", "codmod", "ie")
+
+
+class FilterIndex:
+    def __init__(self, df: pd.DataFrame, columns: dict[str, str | None]):
+        """
+        columns: {clave de filtro: columna en df}. Las columnas ausentes se omiten.
+        """
+        self._codes = {}     # clave -> código por fila (int32, -1 = vacío)
+        self._values = {}    # clave -> valor de cada código
+        self._postings = {}  # clave -> {valor: posiciones ordenadas}
+        self._options = {}   # clave -> valores ordenados (sin filtros)
+
+        for key, col in columns.items():
+            if not col or col not in df.columns:
+                continue
+
+            codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+            codes = codes.astype(np.int32)
+            values = list(uniques)
+
+            # Una sola pasada: ordenar filas por código y cortar por valor
+            order = np.argsort(codes, kind="stable").astype(np.int32)
+            bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+
+            self._codes[key] = codes
+            self._values[key] = values
+            self._postings[key] = {
+                v: order[bounds[i]:bounds[i + 1]] for i, v in enumerate(values)
+            }
+            self._options[key] = sorted(values)
+
+    def positions(self, selections: dict) -> np.ndarray | None:
+        """
+        Posiciones de fila que cumplen todos los filtros; None si no hay filtros.
+        selections: {clave: valor}; las claves sin índice se ignoran.
+        """
+        lists = []
+        for key, value in selections.items():
+            if key not in self._postings:
+                continue
+            lists.append(self._postings[key].get(value, np.empty(0, dtype=np.int32)))
+
+        if not lists:
+            return None
+
+        # De la lista más corta a la más larga: la intersección se achica rápido
+        lists.sort(key=len)
+        out = lists[0]
+        for other in lists[1:]:
+            if not len(out):
+                break
+            out = np.intersect1d(out, other, assume_unique=True)
+        return out
+
+    def options(self, key: str, selections: dict | None = None) -> list:
+        """
+        Valores de `key` presentes en las filas que cumplen `selections`
+        (cascada de la barra lateral).
+        """
+        if key not in self._codes:
+            return []
+
+        pos = self.positions({k: v for k, v in (selections or {}).items() if k != key})
+        if pos is None:
+            return self._options[key]
+
+        present = self._codes[key][pos]
+        present = np.unique(present[present >= 0])
+        values = self._values[key]
+        return sorted(values[i] for i in present)
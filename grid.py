@@ -0,0 +1,104 @@
+"""
+Grilla paginada del lado del servidor.
+
+En lugar de mandar el frame filtrado completo a st.dataframe (se serializa
+entero en cada rerun), se ordena y se corta en el servidor y solo la página
+visible llega al navegador. El total de filas sale de la fuente sin armar
+las filas.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+PAGE_SIZES = (50, 100, 250, 500)
+NO_SORT = "(sin orden)"
+
+
+class FrameSource:
+    """
+    Fuente sobre un DataFrame ya armado (p. ej. la matriz de completitud).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.columns = list(df.columns)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def sort_values(self, column: str) -> pd.Series:
+        return self.df[column]
+
+    def rows(self, positions: np.ndarray, columns: list[str]) -> pd.DataFrame:
+        return self.df.iloc[positions][columns]
+
+
+class LayoutSource:
+    """
+    Fuente sobre las actas en bloques (ActasLayout) y las posiciones
+    filtradas: solo se arman las filas de la página y, para ordenar, una
+    columna.
+    """
+
+    def __init__(self, layout, positions: np.ndarray | None, columns: list[str]):
+        self.layout = layout
+        self.positions = np.arange(len(layout)) if positions is None else positions
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def sort_values(self, column: str) -> pd.Series:
+        return self.layout.column(column, self.positions)
+
+    def rows(self, positions: np.ndarray, columns: list[str]) -> pd.DataFrame:
+        # Columnas fijas entre páginas (vacías si ninguna fila de la página las tiene)
+        return self.layout.frame(self.positions[positions], columns).reindex(columns=columns)
+
+
+def sort_order(source, column: str, ascending: bool) -> np.ndarray:
+    """
+    Posiciones (dentro de la fuente) ordenadas por `column`; vacíos al final.
+    """
+    values = source.sort_values(column).reset_index(drop=True)
+    return values.sort_values(ascending=ascending, na_position="last", kind="stable").index.to_numpy()
+
+
+def paginated_grid(source, key: str, height: int = 520, memo=None, memo_key: tuple = ()):
+    """
+    Dibuja controles (columnas, orden, filas por página, página) y la página
+    visible. memo (ResultMemo) guarda el orden calculado por (memo_key,
+    columna, sentido) para no reordenar al cambiar de página.
+    """
+    n_rows = len(source)
+
+    c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+    columns = c1.multiselect("Columnas", source.columns, default=source.columns, key=f"{key}_cols")
+    sort_col = c2.selectbox("Ordenar por", [NO_SORT] + source.columns, key=f"{key}_sort")
+    ascending = c3.radio("Sentido", ["Asc", "Desc"], key=f"{key}_dir", horizontal=True) == "Asc"
+    page_size = c4.selectbox("Filas por página", PAGE_SIZES, index=1, key=f"{key}_size")
+
+    n_pages = max(1, math.ceil(n_rows / page_size))
+    page = st.number_input("Página", min_value=1, max_value=n_pages, value=1, step=1, key=f"{key}_page")
+    page = min(int(page), n_pages)
+
+    start = (page - 1) * page_size
+    stop = min(start + page_size, n_rows)
+    if sort_col == NO_SORT:
+        window = np.arange(start, stop)
+    else:
+        if memo is not None:
+            order = memo.get(("orden",) + memo_key + (sort_col, ascending),
+                             lambda: sort_order(source, sort_col, ascending))
+        else:
+            order = sort_order(source, sort_col, ascending)
+        window = order[start:stop]
+
+    st.caption(
+        f"{n_rows:,} filas · página {page} de {n_pages} · mostrando {start + 1 if n_rows else 0}–{stop}"
+        .replace(",", " ")
+    )
+    st.dataframe(source.rows(window, columns or source.columns), use_container_width=True, height=height)
@@ -0,0 +1,95 @@
+"""
+Memo LRU de resultados filtrados (posiciones, frames, KPIs, cuadros).
+
+Vive dentro del snapshot (Snapshot.derived), así que se invalida solo al
+cambiar de versión. La clave es la tupla de filtros de la barra lateral más
+los parámetros propios del módulo; se expulsa por tamaño en memoria.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def sizeof(value) -> int:
+    """
+    Tamaño aproximado en bytes de un resultado.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultMemo:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # clave -> (valor, bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple, compute):
+        """
+        Valor memoizado de `key`; si no está, compute() y se guarda. El
+        resultado se comparte entre sesiones: tratarlo como solo lectura.
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key][0]
+            self.misses += 1
+
+        # Fuera del lock: dos sesiones pueden calcular lo mismo a la vez,
+        # pero ninguna espera por otra
+        value = compute()
+        size = sizeof(value)
+
+        with self._lock:
+            if size > self.max_bytes:
+                return value
+            if key in self._items:
+                self.nbytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self.nbytes -= old_size
+                self.evictions += 1
+        return value
+
+    def peek(self, key: tuple, default=None):
+        """
+        Valor guardado de `key` sin calcularlo (ni contar acierto / fallo).
+        """
+        with self._lock:
+            item = self._items.get(key)
+            return default if item is None else item[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entradas": len(self._items),
+                "bytes": self.nbytes,
+                "aciertos": self.hits,
+                "fallos": self.misses,
+                "expulsiones": self.evictions,
+            }
+
+
+def format_memo(stats: dict) -> str:
+    return (
+        f"Memo: {stats['aciertos']} aciertos · {stats['fallos']} fallos · "
+        f"{stats['entradas']} entradas ({stats['bytes'] / (1024 * 1024):.1f} MB)"
+    )
@@ -0,0 +1,321 @@
+"""
+Informes PDF (ReportLab) sin dependencia de Streamlit.
+
+Los builders reciben datos ya calculados (cuadro resumen, totales, filtros)
+y devuelven los bytes del PDF; progress(fracción) se llama mientras se arma
+el documento. ReportJobs los corre en un pool de hilos y guarda el resultado
+por clave (versión del snapshot, filtros, tipo de informe): pedir dos veces
+el mismo informe no lo vuelve a generar.
+"""
+import io
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from memo import sizeof
+
+
+REPORT_WORKERS = 2
+# Presupuesto de los informes terminados (PDF y ZIP de lotes)
+REPORT_CACHE_BYTES = 128 * 1024 * 1024
+
+
+def _build(doc: SimpleDocTemplate, story: list, progress=None):
+    """
+    doc.build con avance: ReportLab estima el tamaño (SIZE_EST) y avisa cada
+    flowable procesado (PROGRESS).
+    """
+    if progress is not None:
+        total = {"n": max(len(story), 1)}
+
+        def callback(kind, value):
+            if kind == "SIZE_EST":
+                total["n"] = max(value, 1)
+            elif kind == "PROGRESS":
+                progress(min(value / total["n"], 1.0))
+
+        doc.setProgressCallBack(callback)
+    doc.build(story)
+    if progress is not None:
+        progress(1.0)
+
+
+# -------------------------
+# 📊 GENERADOR DE CUADROS RESUMEN (Tipo Informe Ayacucho)
+# -------------------------
+def generar_cuadro_resumen(counts: pd.DataFrame):
+    """
+    Cuadro SI/NO de todas las preguntas a partir de los conteos si / no /
+    otros por pregunta (AnswerCube.counts / AnswerMatrix.counts).
+    """
+    total = counts.sum(axis=1)
+    counts = counts[total > 0]
+    total = total[total > 0]
+
+    return pd.DataFrame({
+        "Pregunta": counts.index,
+        "IEE SI": counts["si"].to_numpy(),
+        "% SI": (counts["si"] / total * 100).round(1).to_numpy(),
+        "IEE NO": counts["no"].to_numpy(),
+        "% NO": (counts["no"] / total * 100).round(1).to_numpy(),
+    })
+
+
+# -------------------------
+# 📑 INFORME COMPLETO
+# -------------------------
+def build_informe_completo(resumen_df: pd.DataFrame, totales: dict, filtros: dict, progress=None) -> bytes:
+    """
+    Informe consolidado: KPIs y un cuadro SI/NO por pregunta.
+    filtros: {"acta", "ugel", "dep"} (valores de la barra lateral).
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    story = []
+
+    story.append(Paragraph("INFORME DE VISITA DE CONTROL", styles["Title"]))
+    story.append(Spacer(1,12))
+
+    story.append(Paragraph(
+        f"Acta: {filtros['acta']} | UGEL: {filtros['ugel']} | Departamento: {filtros['dep']}",
+        styles["Normal"]
+    ))
+    story.append(Spacer(1,12))
+
+    # KPIs generales
+    tabla_kpi = Table([
+        ["Indicador","Valor"],
+        ["Total Registros", totales["registros"]],
+        ["Total IIEE", totales["iiee"]]
+    ])
+
+    tabla_kpi.setStyle(TableStyle([
+        ("GRID",(0,0),(-1,-1),0.5,colors.black),
+        ("BACKGROUND",(0,0),(-1,0),colors.lightgrey)
+    ]))
+
+    story.append(tabla_kpi)
+    story.append(Spacer(1,20))
+
+    # CUADROS POR PREGUNTA
+    for _, row in resumen_df.iterrows():
+        story.append(Paragraph(f"Pregunta: {row['Pregunta']}", styles["Heading3"]))
+        story.append(Spacer(1,6))
+
+        tabla = Table([
+            ["Respuesta","Cantidad IEE","%"],
+            ["SI", row["IEE SI"], f"{row['% SI']}%"],
+            ["NO", row["IEE NO"], f"{row['% NO']}%"],
+        ])
+
+        tabla.setStyle(TableStyle([
+            ("GRID",(0,0),(-1,-1),0.5,colors.black),
+            ("BACKGROUND",(0,0),(-1,0),colors.lightgrey)
+        ]))
+
+        story.append(tabla)
+        story.append(Spacer(1,15))
+
+    _build(doc, story, progress)
+    return buffer.getvalue()
+
+
+# -------------------------
+# 📄 INFORME MVP (una pregunta)
+# -------------------------
+def build_informe_mvp(totales: dict, filtros: dict, pregunta: str | None,
+                      conteo: tuple[int, int, int] | None, progress=None) -> bytes:
+    """
+    KPIs + cuadro de respuestas de una pregunta. conteo = (si, no, otros).
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=1.8*cm,
+        leftMargin=1.8*cm,
+        topMargin=1.6*cm,
+        bottomMargin=1.6*cm
+    )
+    styles = getSampleStyleSheet()
+    story = []
+
+    title = "INFORME DE VISITA DE CONTROL"
+    story.append(Paragraph(title, styles["Title"]))
+    story.append(Spacer(1, 12))
+
+    # Encabezado
+    subt = f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')} | Filtro Acta: {filtros['acta']} | Filtro UGEL: {filtros['ugel']}"
+    story.append(Paragraph(subt, styles["Normal"]))
+    story.append(Spacer(1, 12))
+
+    # Tabla KPIs
+    kpi_data = [
+        ["Indicador", "Valor"],
+        ["Total Registros", str(totales["registros"])],
+        ["Total IIEE (cód. modular únicos)", str(totales["iiee"])],
+        ["Total UGEL", str(totales["ugel"])],
+    ]
+    t = Table(kpi_data, colWidths=[10*cm, 6*cm])
+    t.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("GRID", (0, 0), (-1, -1), 0.6, colors.black),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("ALIGN", (1, 1), (1, -1), "CENTER"),
+    ]))
+    story.append(t)
+    story.append(Spacer(1, 16))
+
+    # Cuadro SI/NO por pregunta
+    if pregunta and conteo is not None:
+        yes, no, other = conteo
+        total = yes + no + other
+
+        story.append(Paragraph(f"CUADRO: Resumen de Respuestas – {pregunta}", styles["Heading2"]))
+        story.append(Spacer(1, 8))
+
+        cuadro = [
+            ["Respuesta", "Cantidad IIEE", "Porcentaje"],
+            ["SI", str(yes), f"{(yes/total*100):.1f}%" if total else "0.0%"],
+            ["NO", str(no), f"{(no/total*100):.1f}%" if total else "0.0%"],
+            ["OTROS/VACÍO", str(other), f"{(other/total*100):.1f}%" if total else "0.0%"],
+        ]
+        tt = Table(cuadro, colWidths=[6*cm, 5*cm, 5*cm])
+        tt.setStyle(TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+            ("GRID", (0, 0), (-1, -1), 0.6, colors.black),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("ALIGN", (1, 1), (-1, -1), "CENTER"),
+        ]))
+        story.append(tt)
+        story.append(Spacer(1, 10))
+
+    _build(doc, story, progress)
+    return buffer.getvalue()
+
+
+# -------------------------
+# ⚠️ REPORTE DE SITUACIONES ADVERSAS
+# -------------------------
+def build_situaciones_pdf(titulo: str, chart_png: bytes, progress=None) -> bytes:
+    """
+    Título + gráfico de ranking en PNG (charts.render_situaciones_png; en
+    pantalla el gráfico es nativo y este PNG se dibuja solo para el PDF).
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    story = []
+
+    story.append(Paragraph("REPORTE DE SITUACIONES ADVERSAS", styles["Title"]))
+    story.append(Spacer(1, 12))
+
+    # 🔥 Título dinámico dentro del PDF
+    story.append(Paragraph(titulo, styles["Heading2"]))
+    story.append(Spacer(1, 12))
+
+    story.append(Image(io.BytesIO(chart_png), width=16*cm, height=9*cm))
+
+    _build(doc, story, progress)
+    return buffer.getvalue()
+
+
+# -------------------------
+# ⏳ GENERACIÓN EN SEGUNDO PLANO
+# -------------------------
+class ReportJob:
+    """
+    Un informe en curso o terminado; progress va de 0 a 1.
+    """
+
+    def __init__(self, future=None):
+        self.future = future
+        self.progress = 0.0
+        self.started_at = time.time()
+        self.seconds = None
+        self.nbytes = 0
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def error(self) -> BaseException | None:
+        return self.future.exception() if self.future.done() else None
+
+    def result(self) -> bytes:
+        return self.future.result()
+
+
+class ReportJobs:
+    """
+    Informes en un pool de hilos, guardados por clave. submit() con una
+    clave que ya está en curso o terminada devuelve ese mismo trabajo (no
+    hay builds duplicados); solo se reintenta si el anterior falló.
+
+    Los terminados se guardan hasta max_bytes (tamaño del resultado, como en
+    ResultMemo); al pasarse se descartan los más viejos, nunca uno en curso
+    ni el que acaba de terminar.
+    """
+
+    def __init__(self, workers: int = REPORT_WORKERS, max_bytes: int = REPORT_CACHE_BYTES):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+
+    def submit(self, key: tuple, builder) -> ReportJob:
+        """
+        builder(progress) -> bytes, o (bytes, texto) con un detalle para
+        mostrar junto a la descarga (p. ej. los tiempos de un lote).
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.error() is None:
+                self._jobs.move_to_end(key)
+                return job
+
+            job = ReportJob()
+
+            def run():
+                try:
+                    result = builder(lambda p: setattr(job, "progress", p))
+                finally:
+                    job.seconds = round(time.time() - job.started_at, 2)
+                self._store(key, job, result)
+                return result
+
+            job.future = self._executor.submit(run)
+            self._jobs[key] = job
+            return job
+
+    def _store(self, key: tuple, job: ReportJob, result):
+        """
+        Suma el resultado al presupuesto y descarta los terminados más
+        viejos hasta volver a max_bytes.
+        """
+        with self._lock:
+            if self._jobs.get(key) is not job:
+                return
+            job.nbytes = sizeof(result)
+            self.nbytes += job.nbytes
+            for old_key, old in list(self._jobs.items()):
+                if self.nbytes <= self.max_bytes:
+                    break
+                if old is job or not old.done():
+                    continue
+                del self._jobs[old_key]
+                self.nbytes -= old.nbytes
+
+    def get(self, key: tuple) -> ReportJob | None:
+        with self._lock:
+            return self._jobs.get(key)
@@ -0,0 +1,156 @@
+"""
+Tipado compacto de los DataFrames que vienen de Sheets.
+
+Todo llega como texto; aquí se pasan a categóricas las columnas repetitivas
+(UGEL, departamento, provincia, distrito, acta, respuestas SI/NO), el código
+modular a entero nullable y la fecha de visita a datetime.
+"""
+import re
+
+import pandas as pd
+
+
+CODMOD_CANDIDATES = ["codigo_modular", "cod_mod", "cod_modular"]
+FECHA_CANDIDATES = ["fecha_visita", "fecha", "fecha_de_visita"]
+
+# Siempre categóricas (si existen)
+CATEGORY_COLUMNS = {
+    "acta",
+    "ugel", "ugel_1", "dre_ugel", "d_dreugel", "ugel_x", "ugel_y",
+    "departamento_final", "departamento", "dpto", "d_dpto",
+    "provincia_final", "provincia", "d_prov",
+    "distrito_final", "distrito", "d_dist",
+    "región", "region",
+}
+
+# Heurística para el resto de columnas de texto (respuestas, nombres de IE...)
+CATEGORY_MAX_UNIQUE = 1000
+CATEGORY_MAX_RATIO = 0.5
+
+# Solo se convierte la fecha si casi todo lo no vacío es fecha válida
+DATE_MIN_PARSED = 0.9
+
+ACTA_LABELS = [f"ACTA {i:02d}" for i in range(1, 7)]
+
+
+def _is_text(s: pd.Series) -> bool:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return False
+    return s.dtype == object or pd.api.types.is_string_dtype(s)
+
+
+# -------------------------
+# 📑 ETIQUETA DE ACTA
+# -------------------------
+def canonical_acta(label: str) -> str:
+    """
+    'Acta 3', 'ACTA_03', 'acta03' -> 'ACTA 03' (solo 1..6); si no, el texto en mayúsculas.
+    Se usa una vez por pestaña, con el nombre de la hoja.
+    """
+    s = str(label).strip().upper()
+    m = re.search(r"(\d+)", s)
+    if m:
+        n = int(m.group(1))
+        if 1 <= n <= 6:
+            return f"ACTA {n:02d}"
+    return s
+
+
+def acta_dtype(extra: list[str] | None = None) -> pd.CategoricalDtype:
+    return pd.CategoricalDtype(ACTA_LABELS + sorted(extra or []), ordered=True)
+
+
+def acta_categorical(s: pd.Series) -> pd.Series:
+    """
+    Columna acta como categórica ordenada ACTA 01..ACTA 06 (+ etiquetas raras al final).
+    La normalización de texto se hace vectorizada sobre los valores únicos,
+    no fila por fila.
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype) and s.dtype.ordered \
+            and list(s.dtype.categories[:len(ACTA_LABELS)]) == ACTA_LABELS:
+        return s
+
+    uniques = pd.Series(s.dropna().unique()).astype("string")
+    txt = uniques.str.strip().str.upper()
+    num = pd.to_numeric(txt.str.extract(r"(\d+)", expand=False), errors="coerce")
+    canon = ("ACTA " + num.astype("Int64").astype("string").str.zfill(2)).where(num.between(1, 6), txt)
+
+    mapping = dict(zip(uniques, canon))
+    extra = sorted(set(canon) - set(ACTA_LABELS))
+    return s.astype("string").map(mapping).astype(acta_dtype(extra))
+
+
+def to_codmod(s: pd.Series) -> pd.Series:
+    """
+    Código modular como Int64 nullable ("1234567.0" -> 1234567, "" -> <NA>).
+    """
+    if pd.api.types.is_integer_dtype(s):
+        return s.astype("Int64")
+    txt = s.astype("string").str.strip().str.replace(r"\.0+$", "", regex=True)
+    return pd.to_numeric(txt, errors="coerce").astype("Int64")
+
+
+def to_fecha(s: pd.Series) -> pd.Series:
+    """
+    Fecha dd/mm/aaaa -> datetime. Si no parsea lo suficiente, se deja igual.
+    """
+    if pd.api.types.is_datetime64_any_dtype(s) or not _is_text(s):
+        return s
+    txt = s.astype("string").str.strip().replace("", pd.NA)
+    parsed = pd.to_datetime(txt, dayfirst=True, errors="coerce")
+    filled = txt.notna().sum()
+    if filled and parsed.notna().sum() / filled >= DATE_MIN_PARSED:
+        return parsed
+    return s
+
+
+def _should_categorize(name: str, s: pd.Series, use_heuristic: bool) -> bool:
+    if not _is_text(s):
+        return False
+    if name in CATEGORY_COLUMNS:
+        return True
+    if not use_heuristic or s.empty:
+        return False
+    n_unique = s.nunique(dropna=True)
+    return n_unique <= CATEGORY_MAX_UNIQUE and n_unique <= CATEGORY_MAX_RATIO * len(s)
+
+
+def apply_schema(df: pd.DataFrame, use_heuristic: bool = True) -> tuple[pd.DataFrame, dict]:
+    """
+    Devuelve (df tipado, reporte). El reporte trae memoria antes/después
+    (bytes, deep=True) y qué columnas se convirtieron.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+
+    converted = {}
+    for col in df.columns:
+        s = df[col]
+        if col in CODMOD_CANDIDATES:
+            converted[col] = to_codmod(s)
+        elif col in FECHA_CANDIDATES:
+            converted[col] = to_fecha(s)
+        elif _should_categorize(col, s, use_heuristic):
+            converted[col] = s.astype("category")
+
+    out = df.assign(**converted) if converted else df
+    after = int(out.memory_usage(deep=True).sum())
+
+    report = {
+        "bytes_antes": before,
+        "bytes_despues": after,
+        "categoricas": sum(1 for c in converted if isinstance(out[c].dtype, pd.CategoricalDtype)),
+        "codmod_invalidos": sum(
+            int((out[c].isna() & df[c].astype("string").str.strip().ne("")).sum())
+            for c in converted if c in CODMOD_CANDIDATES
+        ),
+    }
+    return out, report
+
+
+def format_memory(reports: dict[str, dict]) -> str:
+    parts = []
+    for name, r in reports.items():
+        mb_before = r["bytes_antes"] / (1024 * 1024)
+        mb_after = r["bytes_despues"] / (1024 * 1024)
+        parts.append(f"{name} {mb_before:.1f}→{mb_after:.1f} MB")
+    return " · ".join(parts)
@@ -0,0 +1,506 @@
+"""
+Lectura de las pestañas del Google Sheet del operativo.
+
+Vive fuera de app.py para que la ingesta no dependa de Streamlit
+(se puede reutilizar desde scripts y probar sin levantar la app).
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from gspread.exceptions import APIError
+from gspread.urls import SPREADSHEET_VALUES_BATCH_URL, SPREADSHEET_VALUES_URL
+from gspread.utils import absolute_range_name, fill_gaps, quote, rowcol_to_a1
+from requests.exceptions import ConnectionError, Timeout
+
+from schema import canonical_acta
+
+
+SPREADSHEET_KEY = "1mKljLk6nKMq5o6xSk_pBsFVHHqkX4VDP7dhGrd-nOIU"
+
+# "batch": una sola llamada values:batchGet para todas las pestañas
+# "per_sheet": una llamada get_all_values() por pestaña (modo original)
+# "delta": solo descarga las filas agregadas desde la última sincronización
+# "concurrent": pestañas paginadas por rangos, en paralelo (pestañas muy grandes)
+INGESTION_MODES = ("batch", "per_sheet", "delta", "concurrent")
+
+# Cuota de lectura de Sheets por usuario (la service account) y por minuto
+SHEETS_READS_PER_MINUTE = 60
+CONCURRENT_WORKERS = 4
+PAGE_ROWS = 5000
+
+
+# -------------------------
+# 🧼 HEADERS / DATAFRAMES
+# -------------------------
+def unique_headers(headers: list[str]) -> list[str]:
+    """
+    Normaliza headers (strip + lower) y desduplica con sufijo _1, _2...
+    """
+    seen = {}
+    out = []
+    for h in headers:
+        h_clean = h.strip().lower()
+        if h_clean in seen:
+            seen[h_clean] += 1
+            h_clean = f"{h_clean}_{seen[h_clean]}"
+        else:
+            seen[h_clean] = 0
+        out.append(h_clean)
+    return out
+
+
+def values_to_frame(values: list[list[str]]) -> pd.DataFrame | None:
+    """
+    Convierte la matriz de valores de una pestaña en DataFrame.
+    Devuelve None si la pestaña no tiene filas de datos.
+    """
+    if not values or len(values) < 2:
+        return None
+
+    temp_df = pd.DataFrame(values[1:], columns=unique_headers(values[0]))
+    if temp_df.empty:
+        return None
+    return temp_df
+
+
+def split_frames(values_by_sheet: dict[str, list[list[str]]]):
+    """
+    Reparte las pestañas en (base, [actas...], situaciones) según su nombre.
+    """
+    return classify_frames({
+        title: values_to_frame(values)
+        for title, values in values_by_sheet.items()
+    })
+
+
+def classify_frames(frames_by_sheet: dict[str, pd.DataFrame | None]):
+    """
+    Igual que split_frames, pero a partir de DataFrames ya construidos.
+    """
+    df_base = None
+    df_actas = []
+    df_situaciones = None
+
+    for title, temp_df in frames_by_sheet.items():
+        sheet_name = title.strip().upper()
+
+        if temp_df is None:
+            continue
+
+        # 🔹 BASE CONSOLIDADA
+        if sheet_name == "BASE_CONSOLIDADA":
+            df_base = temp_df
+
+        # 🔹 SITUACIONES
+        elif sheet_name == "SITUACIONES":
+            df_situaciones = temp_df
+
+        # 🔹 ACTAS (assign: no se modifica el frame que guarda DeltaSync)
+        #    La etiqueta sale del nombre de la hoja: se canoniza una vez por pestaña
+        elif sheet_name.startswith("ACTA"):
+            df_actas.append(temp_df.assign(acta=canonical_acta(sheet_name)))
+
+    return df_base, df_actas, df_situaciones
+
+
+# -------------------------
+# 🚦 CUOTA Y REINTENTOS
+# -------------------------
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class SheetsError(RuntimeError):
+    """
+    Falla de la API de Sheets (no reintentable o reintentos agotados).
+    """
+
+
+class TokenBucket:
+    """
+    Limitador token-bucket compartido por todos los hilos del proceso.
+    acquire() bloquea hasta que haya un token disponible.
+    """
+
+    def __init__(self, per_minute: float, burst: int | None = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1, int(per_minute // 6))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+SHEETS_LIMITER = TokenBucket(SHEETS_READS_PER_MINUTE)
+
+_stats_lock = threading.Lock()
+
+
+def _count(stats: dict, key: str, n: int = 1):
+    with _stats_lock:
+        stats[key] = stats.get(key, 0) + n
+
+
+def call_api(fn, stats: dict, limiter: TokenBucket | None = None,
+             retries: int = 5, base_delay: float = 1.0, max_delay: float = 32.0):
+    """
+    Ejecuta una llamada a la API respetando la cuota. Los 429/5xx y los
+    errores de red se reintentan con backoff exponencial + jitter.
+    """
+    limiter = limiter or SHEETS_LIMITER
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        _count(stats, "llamadas_api")
+        try:
+            return fn()
+        except APIError as e:
+            if e.code not in RETRYABLE_CODES:
+                raise SheetsError(f"Google Sheets respondió {e.code}: {e.error.get('message', '')}") from e
+            last = e
+        except (ConnectionError, Timeout) as e:
+            last = e
+
+        if attempt < retries:
+            _count(stats, "reintentos")
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+    raise SheetsError(f"Google Sheets no disponible tras {retries} reintentos: {last}") from last
+
+
+# -------------------------
+# 🔗 DESCARGA DE VALORES
+# -------------------------
+def new_stats(mode: str) -> dict:
+    return {"modo": mode, "llamadas_api": 0, "reintentos": 0, "bytes": 0, "segundos": 0.0}
+
+
+def _col_letter(n: int) -> str:
+    return rowcol_to_a1(1, max(n, 1)).rstrip("0123456789")
+
+
+def _json_bytes(obj) -> int:
+    # Aproximación del tamaño de la respuesta cuando gspread no expone el body
+    return len(json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+
+def fetch_values_per_sheet(spreadsheet, stats: dict) -> dict[str, list[list[str]]]:
+    """
+    Una llamada get_all_values() por pestaña (N round trips).
+    """
+    worksheets = call_api(spreadsheet.worksheets, stats)
+
+    values_by_sheet = {}
+    for ws in worksheets:
+        values = call_api(ws.get_all_values, stats)
+        stats["bytes"] += _json_bytes(values)
+        values_by_sheet[ws.title] = values
+    return values_by_sheet
+
+
+def batch_get(spreadsheet, ranges: list[str], stats: dict) -> list[list[list[str]]]:
+    """
+    Una sola llamada values:batchGet; devuelve los valores de cada range en orden.
+    """
+    if not ranges:
+        return []
+
+    # Se usa request() directo para poder medir los bytes reales de la respuesta
+    response = call_api(
+        lambda: spreadsheet.client.request(
+            "get",
+            SPREADSHEET_VALUES_BATCH_URL % spreadsheet.id,
+            params={"ranges": ranges},
+        ),
+        stats,
+    )
+    stats["bytes"] += len(response.content)
+
+    # valueRanges respeta el orden de los ranges pedidos
+    value_ranges = response.json().get("valueRanges", [])
+
+    out = []
+    for vr in value_ranges:
+        values = vr.get("values", [])
+        # get_all_values() rellena filas cortas; batchGet no
+        out.append(fill_gaps(values) if values else [])
+    return out
+
+
+def fetch_values_batch(spreadsheet, stats: dict) -> dict[str, list[list[str]]]:
+    """
+    Todas las pestañas en una sola llamada values:batchGet.
+    """
+    worksheets = call_api(spreadsheet.worksheets, stats)
+
+    titles = [ws.title for ws in worksheets]
+    values = batch_get(spreadsheet, [absolute_range_name(t) for t in titles], stats)
+    return dict(zip(titles, values))
+
+
+def _get_range(spreadsheet, range_name: str, stats: dict):
+    response = call_api(
+        lambda: spreadsheet.client.request(
+            "get", SPREADSHEET_VALUES_URL % (spreadsheet.id, quote(range_name))
+        ),
+        stats,
+    )
+    return response.json().get("values", []), len(response.content)
+
+
+def fetch_values_concurrent(spreadsheet, stats: dict, max_workers: int = CONCURRENT_WORKERS,
+                            page_rows: int = PAGE_ROWS) -> dict[str, list[list[str]]]:
+    """
+    Cada pestaña se pide en páginas de `page_rows` filas, en paralelo con un
+    pool acotado. Todas las llamadas pasan por el limitador de cuota.
+    """
+    worksheets = call_api(spreadsheet.worksheets, stats)
+
+    # (pestaña, fila inicial, fila final) según el tamaño de la grilla
+    pages = []
+    for ws in worksheets:
+        last_col = _col_letter(ws.col_count)
+        for r0 in range(1, max(ws.row_count, 1) + 1, page_rows):
+            r1 = min(r0 + page_rows - 1, max(ws.row_count, 1))
+            pages.append((ws.title, r0, r1, absolute_range_name(ws.title, f"A{r0}:{last_col}{r1}")))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets-fetch") as pool:
+        results = list(pool.map(lambda p: _get_range(spreadsheet, p[3], stats), pages))
+
+    values_by_sheet = {ws.title: [] for ws in worksheets}
+    for (title, r0, r1, _), (values, nbytes) in zip(pages, results):
+        stats["bytes"] += nbytes
+        rows = values_by_sheet[title]
+        # La API recorta filas vacías al final de cada página: se rellenan
+        # para que la página siguiente quede alineada
+        rows.extend(values)
+        rows.extend([] for _ in range((r1 - r0 + 1) - len(values)))
+
+    for title, rows in values_by_sheet.items():
+        while rows and not rows[-1]:
+            rows.pop()
+        values_by_sheet[title] = fill_gaps(rows) if rows else []
+    return values_by_sheet
+
+
+# -------------------------
+# 🔁 SINCRONIZACIÓN INCREMENTAL
+# -------------------------
+def _trim_row(row: list[str]) -> list[str]:
+    # batchGet recorta celdas vacías al final; se normaliza para comparar
+    end = len(row)
+    while end and row[end - 1] == "":
+        end -= 1
+    return row[:end]
+
+
+def row_checksum(row: list[str]) -> int:
+    return zlib.crc32("\x1f".join(_trim_row(row)).encode("utf-8"))
+
+
+def _fit_row(row: list[str], width: int) -> list[str]:
+    return (row + [""] * (width - len(row)))[:width]
+
+
+class DeltaSync:
+    """
+    Mantiene el último snapshot de cada pestaña y en cada refresh descarga solo:
+      - la fila de headers,
+      - las últimas TAIL_ROWS filas conocidas + todo lo agregado después,
+      - una ventana rotativa de WINDOW_ROWS filas ya conocidas.
+    Los checksums de las filas ya conocidas detectan ediciones; si algo no
+    coincide (o cambian los headers, o se borran filas) esa pestaña se recarga
+    completa. La ventana rotativa recorre toda la hoja cada pocos refresh y
+    además se fuerza una recarga completa cada FULL_RELOAD_EVERY refresh.
+
+    Límite de frescura: filas nuevas, ediciones en la cola, headers y filas
+    borradas se ven en el refresh siguiente. Una edición en medio de la hoja
+    se ve cuando la ventana pasa por esa fila: a lo sumo
+    max_stale_refreshes() refresh después (con el intervalo de 300 s del
+    dashboard, una hora como máximo).
+    """
+
+    TAIL_ROWS = 5
+    WINDOW_ROWS = 500
+    FULL_RELOAD_EVERY = 12
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sheets = {}  # title -> {"header", "hashes", "frame", "cursor"}
+        self._refreshes = 0
+
+    def max_stale_refreshes(self) -> int:
+        """
+        Refresh que puede tardar, como máximo, en verse una edición en medio
+        de la hoja: una vuelta de la ventana por la pestaña más larga, o la
+        recarga completa forzada si llega antes.
+        """
+        with self._lock:
+            rows = max((len(s["hashes"]) for s in self._sheets.values()), default=0)
+        return min(-(-rows // self.WINDOW_ROWS) or 1, self.FULL_RELOAD_EVERY)
+
+    def _store(self, title: str, values: list[list[str]]):
+        frame = values_to_frame(values)
+        header = values[0] if values else []
+        hashes = [row_checksum(r) for r in values[1:]] if frame is not None else []
+        self._sheets[title] = {
+            "header": _trim_row(header),
+            "hashes": hashes,
+            "frame": frame,
+            "cursor": 0,
+        }
+
+    def _plan(self, title: str) -> list[str]:
+        """
+        Ranges a pedir para una pestaña conocida: [header, cola, ventana].
+        """
+        state = self._sheets[title]
+        n = len(state["hashes"])
+        last_col = _col_letter(len(state["header"]))
+
+        # Fila de hoja = índice de dato + 2 (fila 1 = headers)
+        tail_start = max(n - self.TAIL_ROWS, 0)
+        w_start = state["cursor"] if state["cursor"] < n else 0
+        w_end = min(w_start + self.WINDOW_ROWS, n)
+
+        return [
+            absolute_range_name(title, "1:1"),
+            absolute_range_name(title, f"A{tail_start + 2}:{last_col}"),
+            absolute_range_name(title, f"A{w_start + 2}:{last_col}{w_end + 1}"),
+        ]
+
+    def _apply(self, title: str, header, tail, window, stats: dict) -> bool:
+        """
+        Valida y fusiona la respuesta incremental. False = requiere recarga completa.
+        """
+        state = self._sheets[title]
+        hashes = state["hashes"]
+        n = len(hashes)
+
+        if state["frame"] is None or _trim_row(header[0] if header else []) != state["header"]:
+            return False
+
+        tail_start = max(n - self.TAIL_ROWS, 0)
+        known = n - tail_start
+        if len(tail) < known:
+            return False  # se borraron filas
+        if [row_checksum(r) for r in tail[:known]] != hashes[tail_start:]:
+            return False  # edición en la cola
+
+        w_start = state["cursor"] if state["cursor"] < n else 0
+        w_end = min(w_start + self.WINDOW_ROWS, n)
+        if [row_checksum(r) for r in window[: w_end - w_start]] != hashes[w_start:w_end]:
+            return False  # edición en medio de la hoja
+        state["cursor"] = w_end if w_end < n else 0
+
+        appended = tail[known:]
+        if appended:
+            width = len(state["frame"].columns)
+            new_df = pd.DataFrame(
+                [_fit_row(r, width) for r in appended],
+                columns=state["frame"].columns,
+            )
+            state["frame"] = pd.concat([state["frame"], new_df], ignore_index=True)
+            hashes.extend(row_checksum(r) for r in appended)
+            stats["filas_nuevas"] += len(appended)
+        return True
+
+    def refresh(self, spreadsheet, stats: dict) -> dict[str, pd.DataFrame | None]:
+        """
+        Sincroniza contra el spreadsheet y devuelve {pestaña: DataFrame}.
+        """
+        with self._lock:
+            stats.setdefault("filas_nuevas", 0)
+            stats.setdefault("recargas_completas", 0)
+
+            worksheets = call_api(spreadsheet.worksheets, stats)
+            titles = [ws.title for ws in worksheets]
+
+            full = (
+                self._refreshes % self.FULL_RELOAD_EVERY == 0
+                or set(titles) != set(self._sheets)
+            )
+            self._refreshes += 1
+
+            if full:
+                reload_titles = titles
+                self._sheets = {}
+            else:
+                # Pestañas sin datos: se piden completas (son pequeñas)
+                incremental = [t for t in titles if self._sheets[t]["frame"] is not None]
+                reload_titles = [t for t in titles if t not in incremental]
+
+                ranges = [r for t in incremental for r in self._plan(t)]
+                results = batch_get(spreadsheet, ranges, stats)
+
+                for i, t in enumerate(incremental):
+                    header, tail, window = results[3 * i: 3 * i + 3]
+                    if not self._apply(t, header, tail, window, stats):
+                        reload_titles.append(t)
+
+            if reload_titles:
+                values = batch_get(
+                    spreadsheet, [absolute_range_name(t) for t in reload_titles], stats
+                )
+                for t, v in zip(reload_titles, values):
+                    self._store(t, v)
+                stats["recargas_completas"] += len(reload_titles)
+
+            return {t: self._sheets[t]["frame"] for t in titles}
+
+
+def load_spreadsheet(client, key: str = SPREADSHEET_KEY, mode: str = "batch",
+                     delta: DeltaSync | None = None):
+    """
+    Abre el spreadsheet y devuelve (base, [actas...], situaciones, stats).
+    stats reporta llamadas a la API, bytes descargados y tiempo total.
+    El modo "delta" necesita un DeltaSync que persista entre cargas.
+    """
+    if mode not in INGESTION_MODES:
+        raise ValueError(f"Modo de ingesta desconocido: {mode}")
+    if mode == "delta" and delta is None:
+        raise ValueError("El modo delta requiere una instancia de DeltaSync.")
+
+    stats = new_stats(mode)
+    t0 = time.perf_counter()
+
+    spreadsheet = call_api(lambda: client.open_by_key(key), stats)
+
+    if mode == "delta":
+        df_base, df_actas, df_situaciones = classify_frames(delta.refresh(spreadsheet, stats))
+    elif mode == "batch":
+        df_base, df_actas, df_situaciones = split_frames(fetch_values_batch(spreadsheet, stats))
+    elif mode == "concurrent":
+        df_base, df_actas, df_situaciones = split_frames(fetch_values_concurrent(spreadsheet, stats))
+    else:
+        df_base, df_actas, df_situaciones = split_frames(fetch_values_per_sheet(spreadsheet, stats))
+
+    stats["segundos"] = round(time.perf_counter() - t0, 3)
+    return df_base, df_actas, df_situaciones, stats
+
+
+def format_stats(stats: dict) -> str:
+    mb = stats["bytes"] / (1024 * 1024)
+    text = (
+        f"{stats['llamadas_api']} llamadas API · {mb:.2f} MB · "
+        f"{stats['segundos']:.1f} s ({stats['modo']})"
+    )
+    if stats["modo"] == "delta":
+        text += f" · +{stats['filas_nuevas']} filas, {stats['recargas_completas']} recargas"
+    if stats.get("reintentos"):
+        text += f" · {stats['reintentos']} reintentos"
+    return text
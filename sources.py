@@ -0,0 +1,275 @@
+"""
+Fuentes de datos intercambiables para el dashboard.
+
+- GoogleSheetsSource: el Google Sheet del operativo (producción).
+- LocalDirSource: un directorio con un CSV/XLSX por pestaña
+  (BASE_CONSOLIDADA.csv, SITUACIONES.csv, ACTA 01.csv, ...), p. ej. lo que
+  se obtiene con "Archivo > Descargar" desde Google Sheets.
+- FakeGspreadClient: imita a gspread sobre esos mismos archivos, con
+  latencia y errores configurables, para medir el pipeline completo
+  (batch, delta, reintentos) sin red.
+
+Se eligen con OPERATIVO_DATA_SOURCE: "sheets", "sheets:<key>",
+"local:<dir>" o "fake:<dir>".
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from urllib.parse import unquote
+
+import pandas as pd
+from gspread.exceptions import APIError
+from gspread.utils import a1_range_to_grid_range
+from requests import Response
+
+from sheets import SPREADSHEET_KEY, DeltaSync, load_spreadsheet, new_stats, split_frames
+
+
+LOCAL_EXTENSIONS = (".csv", ".xlsx")
+
+
+class DataSource(ABC):
+    """
+    Interfaz común: load() -> (base, [actas...], situaciones, stats).
+    cache_key identifica la fuente (p. ej. para separar snapshots en disco).
+    """
+
+    cache_key = "source"
+
+    @abstractmethod
+    def load(self):
+        ...
+
+
+class GoogleSheetsSource(DataSource):
+    def __init__(self, client, key: str = SPREADSHEET_KEY, mode: str = "delta"):
+        self.client = client
+        self.key = key
+        self.mode = mode
+        # El estado incremental vive con la fuente
+        self.delta = DeltaSync() if mode == "delta" else None
+        self.cache_key = f"sheets-{key}"
+
+    def load(self):
+        return load_spreadsheet(self.client, self.key, mode=self.mode, delta=self.delta)
+
+
+# -------------------------
+# 📂 ARCHIVOS LOCALES
+# -------------------------
+def read_local_values(path: str) -> list[list[str]]:
+    """
+    Lee un CSV/XLSX como lo devolvería Sheets: matriz de strings sin NaN,
+    sin filas vacías al final.
+    """
+    if path.lower().endswith(".xlsx"):
+        raw = pd.read_excel(path, header=None, dtype=str, keep_default_na=False)
+    else:
+        raw = pd.read_csv(path, header=None, dtype=str, keep_default_na=False)
+
+    values = raw.values.tolist()
+    while values and not any(values[-1]):
+        values.pop()
+    return values
+
+
+def read_local_dir(path: str) -> dict[str, list[list[str]]]:
+    """
+    {nombre de pestaña: valores}; el nombre de la pestaña es el del archivo.
+    """
+    if not os.path.isdir(path):
+        raise ValueError(f"No existe el directorio de datos locales: {path}")
+
+    values_by_sheet = {}
+    for fname in sorted(os.listdir(path)):
+        title, ext = os.path.splitext(fname)
+        if ext.lower() in LOCAL_EXTENSIONS:
+            values_by_sheet[title] = read_local_values(os.path.join(path, fname))
+    return values_by_sheet
+
+
+class LocalDirSource(DataSource):
+    def __init__(self, path: str):
+        self.path = path
+        self.cache_key = f"local-{os.path.basename(os.path.abspath(path))}"
+
+    def load(self):
+        stats = new_stats("local")
+        t0 = time.perf_counter()
+
+        df_base, df_actas, df_situaciones = split_frames(read_local_dir(self.path))
+
+        stats["bytes"] = sum(
+            os.path.getsize(os.path.join(self.path, f))
+            for f in os.listdir(self.path)
+            if f.lower().endswith(LOCAL_EXTENSIONS)
+        )
+        stats["segundos"] = round(time.perf_counter() - t0, 3)
+        return df_base, df_actas, df_situaciones, stats
+
+
+# -------------------------
+# 🧪 GSPREAD SIMULADO
+# -------------------------
+def _api_error(code: int, message: str) -> APIError:
+    response = Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {"code": code, "message": message}}).encode()
+    return APIError(response)
+
+
+def _trim_values(values: list[list[str]]) -> list[list[str]]:
+    # Igual que la API: sin celdas vacías al final de fila ni filas vacías al final
+    out = []
+    for row in values:
+        end = len(row)
+        while end and row[end - 1] == "":
+            end -= 1
+        out.append(row[:end])
+    while out and not out[-1]:
+        out.pop()
+    return out
+
+
+class _FakeResponse:
+    def __init__(self, payload: dict):
+        self.content = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeWorksheet:
+    def __init__(self, client, title: str):
+        self.client = client
+        self.title = title
+
+    @property
+    def row_count(self) -> int:
+        # Como en Sheets, la grilla suele tener filas vacías de sobra
+        return len(self.client.data[self.title]) + 100
+
+    @property
+    def col_count(self) -> int:
+        return max((len(r) for r in self.client.data[self.title]), default=1)
+
+    def get_all_values(self):
+        self.client.simulate_call()
+        values = _trim_values(self.client.data[self.title])
+        width = max((len(r) for r in values), default=0)
+        return [r + [""] * (width - len(r)) for r in values]
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, key: str):
+        self.client = client
+        self.id = key
+
+    def worksheets(self):
+        self.client.simulate_call()
+        return [FakeWorksheet(self.client, t) for t in self.client.data]
+
+
+class FakeGspreadClient:
+    """
+    Sustituto de gspread.Client con la parte de la API que usa sheets.py.
+
+    latency: segundos por llamada (+ hasta `jitter` s aleatorios).
+    error_rate: probabilidad de que una llamada falle con uno de error_codes.
+    Los datos se pueden modificar en caliente (data[pestaña].append(...))
+    para probar la sincronización incremental.
+    """
+
+    def __init__(self, data: dict[str, list[list[str]]], latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0,
+                 error_codes: tuple[int, ...] = (429, 503), seed: int | None = None):
+        self.data = data
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dir(cls, path: str, **kwargs) -> "FakeGspreadClient":
+        return cls(read_local_dir(path), **kwargs)
+
+    def simulate_call(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            fail = self._rng.random() < self.error_rate
+            code = self._rng.choice(self.error_codes)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise _api_error(code, "Error simulado")
+
+    # --- gspread.Client ---
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        self.simulate_call()
+        return FakeSpreadsheet(self, key)
+
+    # --- gspread.HTTPClient (lo que usa sheets.batch_get / _get_range) ---
+    def request(self, method: str, endpoint: str, params: dict | None = None, **kwargs):
+        self.simulate_call()
+        if endpoint.endswith("values:batchGet"):
+            ranges = params["ranges"]
+            return _FakeResponse({"valueRanges": [self._range_payload(r) for r in ranges]})
+        range_name = unquote(endpoint.rsplit("/values/", 1)[1])
+        return _FakeResponse(self._range_payload(range_name))
+
+    def _range_payload(self, range_name: str) -> dict:
+        m = re.match(r"^'((?:[^']|'')*)'(?:!(.+))?$", range_name) or re.match(
+            r"^([^!]+)(?:!(.+))?$", range_name
+        )
+        title = m.group(1).replace("''", "'")
+        if title not in self.data:
+            raise _api_error(400, f"Unable to parse range: {range_name}")
+
+        values = self.data[title]
+        if m.group(2):
+            grid = a1_range_to_grid_range(m.group(2))
+            r0, r1 = grid.get("startRowIndex", 0), grid.get("endRowIndex", len(values))
+            c0, c1 = grid.get("startColumnIndex", 0), grid.get("endColumnIndex")
+            values = [row[c0:c1] for row in values[r0:r1]]
+
+        values = _trim_values(values)
+        payload = {"range": range_name}
+        if values:
+            payload["values"] = values
+        return payload
+
+
+# -------------------------
+# ⚙️ SELECCIÓN POR CONFIGURACIÓN
+# -------------------------
+def source_from_spec(spec: str, gspread_client_factory=None, mode: str = "delta",
+                     fake_options: dict | None = None) -> DataSource:
+    """
+    Crea la fuente a partir de "sheets[:key]", "local:<dir>" o "fake:<dir>".
+    gspread_client_factory solo se llama para "sheets".
+    """
+    kind, _, arg = spec.partition(":")
+    kind = kind.strip().lower()
+
+    if kind == "sheets":
+        return GoogleSheetsSource(gspread_client_factory(), arg or SPREADSHEET_KEY, mode=mode)
+
+    if kind == "local":
+        return LocalDirSource(arg)
+
+    if kind == "fake":
+        client = FakeGspreadClient.from_dir(arg, **(fake_options or {}))
+        source = GoogleSheetsSource(client, SPREADSHEET_KEY, mode=mode)
+        source.cache_key = f"fake-{os.path.basename(os.path.abspath(arg))}"
+        return source
+
+    raise ValueError(f"Fuente de datos desconocida: {spec}")
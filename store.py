@@ -0,0 +1,521 @@
+"""
+Snapshot de datos (base / actas / situaciones) con copia persistente en disco.
+
+El snapshot se escribe una vez en archivos Arrow IPC sin comprimir, junto a
+un snapshot.json con la versión vigente y un refresh.lock. Todos los
+procesos de Streamlit (detrás del balanceador) leen esos archivos y
+recargan cuando cambia la versión; en cada ciclo de refresco solo el
+proceso que toma el lock consulta Google Sheets.
+
+Los frames se copian a la memoria de cada proceso (pandas). Los arreglos
+numéricos grandes derivados (respuestas codificadas, cubo, completitud) se
+guardan una vez como .npy junto al snapshot y todos los procesos los mapean
+de solo lectura (Snapshot.shared_arrays): esas páginas son compartidas.
+
+En frío se sirve lo que haya en disco y, si está viejo, se revalida en
+segundo plano (stale-while-revalidate); ninguna sesión espera a Sheets.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from actas_layout import ActasLayout
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos (un solo proceso)
+    fcntl = None
+
+
+SNAPSHOT_DIR = os.environ.get("OPERATIVO_SNAPSHOT_DIR", ".snapshot_cache")
+# Frames planos; las actas (ActasLayout) van en v{n}_actas.arrow (metadatos)
+# y v{n}_actas_{i}.arrow (un bloque por pestaña)
+SNAPSHOT_FRAMES = ("base", "situaciones")
+
+# Subir cuando cambie lo que se guarda (normalización, tipos...): los
+# snapshots en disco de otro formato se ignoran y se recargan de la fuente
+SNAPSHOT_FORMAT = 6
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    base: pd.DataFrame
+    actas: ActasLayout
+    situaciones: pd.DataFrame
+    stats: dict
+    version: int
+    created_at: float = field(default_factory=time.time)
+    # Directorio del snapshot en disco (None: arreglos derivados en memoria)
+    cache_dir: str | None = field(default=None, repr=False, compare=False)
+    # Estructuras derivadas (índices, agregados...) que viven con el snapshot
+    _derived: dict = field(default_factory=dict, repr=False, compare=False)
+    _derived_lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.created_at
+
+    def derived(self, name: str, builder):
+        """
+        builder(snapshot) se ejecuta una sola vez por snapshot; el resultado se
+        comparte entre sesiones y se libera junto con el snapshot.
+        """
+        with self._derived_lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+            return self._derived[name]
+
+    def shared_arrays(self, name: str, key, builder) -> dict[str, np.ndarray]:
+        """
+        builder() -> {campo: ndarray} lo ejecuta el primer proceso que lo pide
+        y lo guarda como v{n}_{name}_{hash}.{campo}.npy; los demás procesos
+        (y este) mapean esos archivos de solo lectura. `key` son los
+        parámetros del builder (entran en el hash). Si no se puede usar el
+        disco, los arreglos quedan en memoria.
+        """
+        if self.cache_dir is None:
+            return builder()
+        digest = hashlib.sha1(repr((self.created_at, key)).encode()).hexdigest()[:12]
+        stem = os.path.join(self.cache_dir, f"v{self.version}_{name}_{digest}")
+        try:
+            return _map_arrays(stem)
+        except (OSError, ValueError):
+            pass
+        arrays = builder()
+        try:
+            _save_arrays(stem, arrays)
+            return _map_arrays(stem)
+        except (OSError, ValueError):
+            return arrays
+
+
+# -------------------------
+# 🗂️ REGISTRO DE VERSIONES
+# -------------------------
+class SnapshotLease:
+    """
+    Una sesión usando una versión del snapshot. Se libera con release() o
+    cuando el objeto se recolecta (p. ej. al cerrarse la sesión).
+    """
+
+    def __init__(self, registry: "SnapshotRegistry", snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        # El finalizer no guarda referencia a self: se ejecuta una sola vez
+        self._finalizer = weakref.finalize(self, registry._release, snapshot.version)
+
+    def release(self):
+        self._finalizer()
+
+
+class SnapshotRegistry:
+    """
+    Snapshots del proceso por versión, de solo lectura y compartidos por
+    todas las sesiones. publish() cambia la versión vigente de un solo golpe;
+    las versiones anteriores se mantienen mientras alguna sesión tenga un
+    lease sobre ellas y se sueltan cuando su contador llega a 0.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots = {}  # versión -> Snapshot
+        self._refs = {}       # versión -> leases activos
+        self.current_version = None
+
+    def publish(self, snap: Snapshot):
+        with self._lock:
+            self._snapshots[snap.version] = snap
+            self._refs.setdefault(snap.version, 0)
+            self.current_version = snap.version
+            self._collect()
+
+    def current(self) -> Snapshot | None:
+        with self._lock:
+            return self._snapshots.get(self.current_version)
+
+    def acquire(self) -> SnapshotLease:
+        """
+        Lease sobre la versión vigente.
+        """
+        with self._lock:
+            if self.current_version is None:
+                raise LookupError("No hay snapshot publicado")
+            self._refs[self.current_version] += 1
+            snap = self._snapshots[self.current_version]
+        return SnapshotLease(self, snap)
+
+    def _release(self, version: int):
+        with self._lock:
+            if version in self._refs:
+                self._refs[version] -= 1
+                self._collect()
+
+    def _collect(self):
+        # Versiones viejas sin sesiones: fuera del registro (y de memoria
+        # en cuanto nadie más las referencie)
+        for version in [v for v, n in self._refs.items() if n <= 0 and v != self.current_version]:
+            del self._refs[version]
+            del self._snapshots[version]
+
+    def versions(self) -> dict[int, int]:
+        """
+        {versión en memoria: leases activos}.
+        """
+        with self._lock:
+            return dict(self._refs)
+
+
+# -------------------------
+# 💾 PERSISTENCIA EN DISCO
+# -------------------------
+def _meta_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, "snapshot.json")
+
+
+def _lock_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, "refresh.lock")
+
+
+def _frame_path(cache_dir: str, version: int, name: str) -> str:
+    return os.path.join(cache_dir, f"v{version}_{name}.arrow")
+
+
+@contextmanager
+def file_lock(cache_dir: str, blocking: bool = True):
+    """
+    Lock exclusivo entre procesos sobre refresh.lock. Devuelve True si se
+    obtuvo (con blocking=False puede devolver False: otro proceso lo tiene).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(_lock_path(cache_dir), "a+") as f:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_meta(cache_dir: str = SNAPSHOT_DIR) -> dict | None:
+    """
+    snapshot.json (versión vigente en disco). None si no hay o es de otro formato.
+    """
+    try:
+        with open(_meta_path(cache_dir), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return meta
+
+
+def _save_array(path: str, arr: np.ndarray):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr, allow_pickle=False)
+    os.replace(tmp, path)
+
+
+def _save_arrays(stem: str, arrays: dict[str, np.ndarray]):
+    # El índice con los campos se escribe al final: si existe, están todos
+    for name, arr in arrays.items():
+        _save_array(f"{stem}.{name}.npy", np.asarray(arr))
+    _save_array(f"{stem}.npy", np.array(list(arrays), dtype=str))
+
+
+def _map_arrays(stem: str) -> dict[str, np.ndarray]:
+    fields = np.load(f"{stem}.npy", allow_pickle=False).tolist()
+    return {name: np.load(f"{stem}.{name}.npy", mmap_mode="r", allow_pickle=False) for name in fields}
+
+
+def _write_arrow(df: pd.DataFrame, path: str):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Sin compresión: leer es copiar los buffers, sin descomprimir
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _read_arrow(path: str) -> pd.DataFrame:
+    with pa.OSFile(path, "rb") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas()
+
+
+def save_snapshot(snap: Snapshot, cache_dir: str = SNAPSHOT_DIR):
+    """
+    Escribe los .arrow de la versión y luego, de forma atómica, el
+    snapshot.json que apunta a ella. Un lector nunca ve una versión a medias.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    previous = read_meta(cache_dir)
+
+    frames = {name: getattr(snap, name) for name in SNAPSHOT_FRAMES}
+    actas = snap.actas.frames()
+    frames["actas"] = actas[0]
+    frames.update({f"actas_{i}": block for i, block in enumerate(actas[1:])})
+    for name, df in frames.items():
+        path = _frame_path(cache_dir, snap.version, name)
+        _write_arrow(df, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "version": snap.version,
+        "created_at": snap.created_at,
+        "stats": snap.stats,
+        "actas": {"bloques": len(actas) - 1, "columnas": snap.actas.columns},
+    }
+    tmp = _meta_path(cache_dir) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, _meta_path(cache_dir))
+
+    # Limpieza: se conservan esta versión y la anterior (otro proceso puede
+    # estar abriéndola justo ahora); los procesos que ya la leyeron la tienen
+    # en memoria, y los .npy que ya mapearon siguen legibles aunque se borren
+    versions = {snap.version}
+    if previous:
+        versions.add(previous["version"])
+    keep = tuple(f"v{v}_" for v in versions)
+    for fname in os.listdir(cache_dir):
+        if fname.endswith((".arrow", ".parquet", ".npy")) and not fname.startswith(keep):
+            try:
+                os.remove(os.path.join(cache_dir, fname))
+            except OSError:
+                pass
+
+
+def load_snapshot(cache_dir: str = SNAPSHOT_DIR, meta: dict | None = None) -> Snapshot | None:
+    """
+    Lee el último snapshot guardado. None si no hay o está incompleto.
+    """
+    meta = meta or read_meta(cache_dir)
+    if meta is None:
+        return None
+
+    t0 = time.perf_counter()
+    frames = {}
+    size = 0
+    try:
+        names = SNAPSHOT_FRAMES + ("actas",) + tuple(f"actas_{i}" for i in range(meta["actas"]["bloques"]))
+        for name in names:
+            path = _frame_path(cache_dir, meta["version"], name)
+            frames[name] = _read_arrow(path)
+            size += os.path.getsize(path)
+        actas = ActasLayout.from_frames(
+            [frames[name] for name in names[len(SNAPSHOT_FRAMES):]], meta["actas"]["columnas"]
+        )
+    except (OSError, KeyError, ValueError, pa.ArrowException):
+        return None
+
+    # Lo que describe a los datos (memoria, cruce con BASE) se conserva; el
+    # costo de carga es el de leer el disco
+    stats = {
+        **{k: v for k, v in meta.get("stats", {}).items() if k in ("memoria", "cruce_base")},
+        "modo": "disco",
+        "llamadas_api": 0,
+        "bytes": size,
+        "segundos": round(time.perf_counter() - t0, 3),
+    }
+    return Snapshot(
+        base=frames["base"],
+        actas=actas,
+        situaciones=frames["situaciones"],
+        stats=stats,
+        version=meta["version"],
+        created_at=meta["created_at"],
+        cache_dir=cache_dir,
+    )
+
+
+# -------------------------
+# 🔁 REFRESCO EN SEGUNDO PLANO
+# -------------------------
+class SnapshotStore:
+    """
+    Guarda el snapshot vigente del proceso.
+
+    loader() debe devolver (base, actas, situaciones, stats) o lanzar
+    excepción. get() solo espera a la fuente si no hay snapshot ni en
+    memoria ni en disco; el resto de recargas las hace el hilo refresher,
+    que arma el snapshot nuevo aparte y lo publica con un solo swap en el
+    registro. Las sesiones que ya tomaron el anterior (lease) lo siguen
+    usando sin cambios hasta su siguiente rerun.
+
+    Con varios procesos sobre el mismo cache_dir, el refresher de cada uno
+    revisa snapshot.json cada `poll` segundos y adopta la versión nueva si
+    otro proceso la escribió; al vencer el intervalo, solo quien toma el
+    refresh.lock va a la fuente.
+    """
+
+    def __init__(self, loader, cache_dir: str = SNAPSHOT_DIR,
+                 interval: float = 300, jitter: float = 30, max_backoff: float = 1800,
+                 poll: float = 10):
+        self._loader = loader
+        self._cache_dir = cache_dir
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.poll = poll
+
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._thread = None
+        self.registry = SnapshotRegistry()
+
+        self.last_success_at = None
+        self.last_error = None
+        self.failures = 0
+        self.next_refresh_at = None
+
+    @property
+    def cache_dir(self) -> str:
+        return self._cache_dir
+
+    def _build(self) -> Snapshot:
+        base, actas, situaciones, stats = self._loader()
+        # Versión global: la siguiente a la mayor vista (en memoria o en disco)
+        meta = read_meta(self._cache_dir)
+        prev = max(self.registry.current_version or 0, meta["version"] if meta else 0)
+        return Snapshot(base, actas, situaciones, stats, version=prev + 1, cache_dir=self._cache_dir)
+
+    def refresh(self) -> Snapshot:
+        """
+        Recarga síncrona desde la fuente, persiste y reemplaza el snapshot.
+        """
+        snap = self._build()
+        with self._lock:
+            self.registry.publish(snap)
+            self.last_success_at = time.time()
+            self.last_error = None
+            self.failures = 0
+        try:
+            save_snapshot(snap, self._cache_dir)
+        except OSError as e:
+            self.last_error = f"No se pudo guardar el snapshot en disco: {e}"
+        return snap
+
+    def _adopt(self, meta: dict | None = None) -> bool:
+        """
+        Publica la versión de disco si es más nueva que la del proceso.
+        """
+        meta = meta or read_meta(self._cache_dir)
+        if meta is None or meta["version"] <= (self.registry.current_version or 0):
+            return False
+        disk = load_snapshot(self._cache_dir, meta)
+        if disk is None:
+            return False
+        with self._lock:
+            self.registry.publish(disk)
+            self.last_success_at = disk.created_at
+        return True
+
+    def _is_fresh(self, meta: dict | None) -> bool:
+        # Otro proceso refrescó hace poco: no hace falta ir a la fuente
+        return meta is not None and time.time() - meta["created_at"] < self.interval / 2
+
+    def _refresh_cycle(self):
+        """
+        Un ciclo de refresco: solo el proceso que toma el lock va a la fuente.
+        """
+        with file_lock(self._cache_dir, blocking=False) as acquired:
+            if not acquired:
+                return
+            meta = read_meta(self._cache_dir)
+            if self._is_fresh(meta):
+                self._adopt(meta)
+                return
+            self.refresh()
+
+    def _next_delay(self) -> float:
+        if self.failures:
+            # Backoff exponencial con jitter completo
+            return random.uniform(0, min(self.max_backoff, self.interval * 2 ** self.failures))
+        return max(0.0, self.interval + random.uniform(-self.jitter, self.jitter))
+
+    def _run(self, first_delay: float):
+        self.next_refresh_at = time.time() + first_delay
+        while True:
+            time.sleep(max(0.0, min(self.poll, self.next_refresh_at - time.time())))
+            try:
+                self._adopt()
+            except Exception as e:  # disco ilegible: se reintenta en el siguiente poll
+                self.last_error = str(e)
+            if time.time() < self.next_refresh_at:
+                continue
+            try:
+                self._refresh_cycle()
+            except Exception as e:  # se reporta en la UI, se sigue sirviendo lo anterior
+                self.last_error = str(e)
+                self.failures += 1
+            self.next_refresh_at = time.time() + self._next_delay()
+
+    def start(self, first_delay: float | None = None):
+        """
+        Arranca el hilo refresher (uno solo por store).
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(self._next_delay() if first_delay is None else first_delay,),
+                name="snapshot-refresher",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _cold_start(self):
+        if not self._adopt():
+            # Nada en disco: un solo proceso carga de la fuente, el resto
+            # espera el lock y adopta lo que ese proceso escribió
+            with file_lock(self._cache_dir, blocking=True):
+                if not self._adopt():
+                    self.refresh()
+                    self.start()
+                    return
+        # Servido desde disco: revalidar de inmediato en segundo plano (si
+        # otro proceso lo refrescó hace poco, solo se adopta)
+        self.start(first_delay=0)
+
+    def get(self) -> Snapshot:
+        """
+        Snapshot vigente. Solo bloquea si no hay nada en memoria ni en disco.
+        """
+        if self.registry.current_version is None:
+            with self._init_lock:
+                if self.registry.current_version is None:
+                    self._cold_start()
+
+        return self.registry.current()
+
+    def lease(self, previous: SnapshotLease | None = None) -> SnapshotLease:
+        """
+        Lease de la sesión sobre la versión vigente. Si `previous` ya apunta
+        a ella se reutiliza; si no, se toma uno nuevo y se suelta el anterior.
+        """
+        self.get()
+        if previous is not None and previous.version == self.registry.current_version:
+            return previous
+        lease = self.registry.acquire()
+        if previous is not None:
+            previous.release()
+        return lease
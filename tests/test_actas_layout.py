@@ -0,0 +1,48 @@
+"""
+ActasLayout.from_tabs: qué columnas van a meta y cuáles a los bloques.
+"""
+import numpy as np
+import pandas as pd
+
+from actas_layout import ActasLayout
+from fact_table import join_base
+from filter_index import FilterIndex
+
+
+BASE = pd.DataFrame({
+    "codigo_modular": pd.array([1, 2, 3], dtype="Int64"),
+    "ugel": ["UGEL A", "UGEL B", "UGEL C"],
+})
+
+
+def build(tabs: list[pd.DataFrame]) -> ActasLayout:
+    wide = pd.concat(tabs, ignore_index=True).astype({"codigo_modular": "Int64"})
+    wide, _, joined = join_base(wide, BASE, "codigo_modular")
+    return ActasLayout.from_tabs(
+        wide, [(len(t), list(t.columns)) for t in tabs], [*joined, "codigo_modular", "acta"]
+    )
+
+
+def test_base_column_in_some_tabs_goes_to_meta():
+    # ugel solo viene en ACTA 01; el cruce con BASE la completa para todas las filas
+    acta1 = pd.DataFrame({"codigo_modular": [1, 2], "ugel": ["UGEL A", "UGEL B"], "p1": ["SI", "NO"], "acta": "ACTA 01"})
+    acta2 = pd.DataFrame({"codigo_modular": [3, 1], "p2": ["NO", "SI"], "acta": "ACTA 02"})
+    layout = build([acta1, acta2])
+
+    assert "ugel" in layout.meta.columns
+    assert layout.meta["ugel"].astype(str).tolist() == ["UGEL A", "UGEL B", "UGEL C", "UGEL A"]
+    assert [rows for rows, _ in layout.parts("p2")][0].tolist() == [2, 3]
+
+    idx = FilterIndex(layout.meta, {"ugel": "ugel", "acta": "acta"})
+    assert idx.options("ugel") == ["UGEL A", "UGEL B", "UGEL C"]
+    assert np.array_equal(idx.positions({"ugel": "UGEL A"}), [0, 3])
+
+
+def test_key_column_missing_from_a_tab_stays_in_meta():
+    acta1 = pd.DataFrame({"codigo_modular": [1, 2], "p1": ["SI", "NO"], "acta": "ACTA 01"})
+    acta2 = pd.DataFrame({"p2": ["NO"], "acta": "ACTA 02"})
+    layout = build([acta1, acta2])
+
+    assert "codigo_modular" in layout.meta.columns
+    assert layout.meta["codigo_modular"].isna().tolist() == [False, False, True]
+    assert list(layout.frame().columns) == ["codigo_modular", "p1", "acta", "p2", "ugel"]
@@ -0,0 +1,115 @@
+"""
+DeltaSync contra FakeGspreadClient: filas agregadas, ediciones en la cola y
+en medio de la hoja (con retraso acotado), filas borradas y headers.
+"""
+import pytest
+
+import sheets
+from sheets import DeltaSync, TokenBucket, fetch_values_batch, new_stats
+from sources import FakeGspreadClient, FakeSpreadsheet
+
+
+HEADER = ["codigo_modular", "p1", "p2"]
+
+
+@pytest.fixture(autouse=True)
+def no_quota(monkeypatch):
+    # Sin esperas por la cuota de Sheets
+    monkeypatch.setattr(sheets, "SHEETS_LIMITER", TokenBucket(per_minute=1e6, burst=10_000))
+
+
+def make_client(n_rows: int = 1200) -> FakeGspreadClient:
+    rows = [[str(100000 + i), "SI" if i % 2 else "NO", f"obs {i}"] for i in range(n_rows)]
+    return FakeGspreadClient({
+        "BASE_CONSOLIDADA": [["codigo_modular", "ugel"], ["100000", "UGEL 1"]],
+        "ACTA 01": [HEADER] + rows,
+    })
+
+
+def refresh(sync: DeltaSync, client: FakeGspreadClient):
+    stats = new_stats("delta")
+    frames = sync.refresh(FakeSpreadsheet(client, "key"), stats)
+    return frames, stats
+
+
+def synced(n_rows: int = 1200):
+    client = make_client(n_rows)
+    sync = DeltaSync()
+    refresh(sync, client)  # primera carga: completa
+    return client, sync
+
+
+def test_unchanged_refresh_downloads_less_than_batch():
+    client, sync = synced(5000)
+    calls = client.calls
+    frames, stats = refresh(sync, client)
+    # worksheets() + un solo values:batchGet
+    assert client.calls - calls == 2
+    assert stats["recargas_completas"] == 0
+    assert len(frames["ACTA 01"]) == 5000
+
+    batch = new_stats("batch")
+    fetch_values_batch(FakeSpreadsheet(client, "key"), batch)
+    assert stats["bytes"] < batch["bytes"] / 4
+
+
+def test_appended_rows_are_merged_without_reload():
+    client, sync = synced()
+    client.data["ACTA 01"] += [["200000", "SI", "nueva"], ["200001", "NO"]]
+    frames, stats = refresh(sync, client)
+    assert stats["recargas_completas"] == 0
+    assert stats["filas_nuevas"] == 2
+    acta = frames["ACTA 01"]
+    assert len(acta) == 1202
+    assert acta.iloc[-1].tolist() == ["200001", "NO", ""]
+
+
+def test_tail_edit_is_seen_on_next_refresh():
+    client, sync = synced()
+    client.data["ACTA 01"][-2][2] = "editada"
+    frames, stats = refresh(sync, client)
+    assert stats["recargas_completas"] == 1
+    assert frames["ACTA 01"].iloc[-2]["p2"] == "editada"
+
+
+@pytest.mark.parametrize("row", [1, 700, 1100])
+def test_mid_sheet_edit_is_seen_within_bound(row):
+    client, sync = synced()
+    refresh(sync, client)  # la ventana ya pasó por el comienzo
+    bound = sync.max_stale_refreshes()
+    assert bound == 3  # 1200 filas / ventana de 500
+
+    client.data["ACTA 01"][row][1] = "EDITADO"
+    for _ in range(bound):
+        frames, stats = refresh(sync, client)
+        if stats["recargas_completas"]:
+            break
+    assert frames["ACTA 01"].iloc[row - 1]["p1"] == "EDITADO"
+
+
+def test_forced_full_reload_caps_staleness():
+    client, sync = synced(5000)
+    sync.WINDOW_ROWS = 100  # una vuelta de la ventana = 50 refresh
+    assert sync.max_stale_refreshes() == DeltaSync.FULL_RELOAD_EVERY
+
+    client.data["ACTA 01"][4000][1] = "EDITADO"
+    for _ in range(DeltaSync.FULL_RELOAD_EVERY):
+        frames, stats = refresh(sync, client)
+    assert frames["ACTA 01"].iloc[3999]["p1"] == "EDITADO"
+
+
+def test_deleted_rows_trigger_reload():
+    client, sync = synced()
+    del client.data["ACTA 01"][300:310]
+    frames, stats = refresh(sync, client)
+    assert stats["recargas_completas"] == 1
+    assert len(frames["ACTA 01"]) == 1190
+    assert frames["ACTA 01"].iloc[300]["codigo_modular"] == "100310"
+
+
+def test_header_change_triggers_reload():
+    client, sync = synced()
+    client.data["ACTA 01"][0] = HEADER + ["p3"]
+    frames, stats = refresh(sync, client)
+    assert stats["recargas_completas"] == 1
+    assert list(frames["ACTA 01"].columns) == HEADER + ["p3"]
@@ -0,0 +1,55 @@
+"""
+Snapshot.shared_arrays: arreglos derivados mapeados desde el snapshot en disco.
+"""
+import dataclasses
+import os
+
+import numpy as np
+import pandas as pd
+
+from actas_layout import ActasLayout
+from aggregates import AnswerMatrix
+from store import Snapshot, load_snapshot, save_snapshot
+
+
+def snapshot(cache_dir: str, version: int = 1) -> Snapshot:
+    wide = pd.DataFrame({"codigo_modular": [1, 2, 3], "p1": ["SI", "NO", None], "acta": "ACTA 01"})
+    actas = ActasLayout.from_tabs(wide, [(3, list(wide.columns))], ["codigo_modular", "acta"])
+    snap = Snapshot(pd.DataFrame({"codigo_modular": [1, 2, 3]}), actas, pd.DataFrame({"x": [1]}), {},
+                    version=version, cache_dir=cache_dir)
+    save_snapshot(snap, cache_dir)
+    return snap
+
+
+def test_second_process_maps_without_building(tmp_path):
+    snap = snapshot(str(tmp_path))
+    first = AnswerMatrix(snap.actas, ["p1"], share=snap.shared_arrays)
+
+    # Otro proceso: el mismo snapshot leído de disco
+    disk = load_snapshot(str(tmp_path))
+    calls = []
+
+    def share(name, key, builder):
+        return disk.shared_arrays(name, key, lambda: calls.append(name) or builder())
+
+    second = AnswerMatrix(disk.actas, ["p1"], share=share)
+    assert calls == []
+    assert isinstance(second.codes, np.memmap) and not second.codes.flags.writeable
+    np.testing.assert_array_equal(second.codes, first.codes)
+    np.testing.assert_array_equal(second.codes[:, 0], [1, 0, -1])
+
+
+def test_old_versions_are_cleaned_up(tmp_path):
+    snap = snapshot(str(tmp_path))
+    AnswerMatrix(snap.actas, ["p1"], share=snap.shared_arrays)
+    for v in (2, 3):
+        save_snapshot(dataclasses.replace(snap, version=v, _derived={}), str(tmp_path))
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".npy")]
+
+
+def test_without_cache_dir_stays_in_memory():
+    wide = pd.DataFrame({"p1": ["SI"], "acta": "ACTA 01"})
+    actas = ActasLayout.from_tabs(wide, [(1, list(wide.columns))], ["acta"])
+    snap = Snapshot(pd.DataFrame(), actas, pd.DataFrame(), {}, version=1)
+    codes = AnswerMatrix(actas, ["p1"], share=snap.shared_arrays).codes
+    assert not isinstance(codes, np.memmap)